@@ -0,0 +1,51 @@
+"""
+Lumina Studio - Color Replacement Kernels
+
+Numba-compiled pixel kernels used by ColorReplacementManager.
+Numba is optional: when it is not installed, NUMBA_AVAILABLE is False and
+callers fall back to the pure NumPy implementation.
+"""
+
+import numpy as np
+
+# Try to import numba with error handling
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(parallel=True, cache=True)
+    def apply_replacements(rgb, originals, replacements, out):
+        """
+        Write rgb into out, swapping every pixel that equals originals[m]
+        for replacements[m].
+
+        Args:
+            rgb: (H, W, 3) uint8 source image
+            originals: (K, 3) uint8 original colors
+            replacements: (K, 3) uint8 replacement colors
+            out: (H, W, 3) uint8 destination (may not alias rgb)
+        """
+        h, w = rgb.shape[0], rgb.shape[1]
+        k = originals.shape[0]
+        for i in prange(h):
+            for j in range(w):
+                r = rgb[i, j, 0]
+                g = rgb[i, j, 1]
+                b = rgb[i, j, 2]
+                matched = False
+                for m in range(k):
+                    if r == originals[m, 0] and g == originals[m, 1] and b == originals[m, 2]:
+                        out[i, j, 0] = replacements[m, 0]
+                        out[i, j, 1] = replacements[m, 1]
+                        out[i, j, 2] = replacements[m, 2]
+                        matched = True
+                        break
+                if not matched:
+                    out[i, j, 0] = r
+                    out[i, j, 1] = g
+                    out[i, j, 2] = b
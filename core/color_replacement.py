@@ -5,9 +5,22 @@ Manages color replacement mappings for preview and final model generation.
 Supports CRUD operations on color mappings and batch application to images.
 """
 
+import re
 from typing import Dict, Tuple, Optional, List
 import numpy as np
 
+from core._cr_kernels import NUMBA_AVAILABLE
+
+if NUMBA_AVAILABLE:
+    from core._cr_kernels import apply_replacements
+
+# rgb(r, g, b) / rgba(r, g, b, a) strings as emitted by Gradio ColorPicker
+_RGB_RE = re.compile(r'rgba?\s*\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)')
+
+# Without Numba, up to this many mappings are applied with direct per-color
+# compares, which beat packing + searchsorted for the common 1-3 case
+SMALL_MAPPING_COUNT = 4
+
 
 class ColorReplacementManager:
     """
@@ -20,6 +33,12 @@ class ColorReplacementManager:
     def __init__(self):
         """Initialize an empty color replacement manager."""
         self._replacements: Dict[Tuple[int, int, int], Tuple[int, int, int]] = {}
+        
+        # Array view of _replacements sorted by packed key, rebuilt lazily
+        self._orig_arr = np.empty((0, 3), dtype=np.uint8)
+        self._repl_arr = np.empty((0, 3), dtype=np.uint8)
+        self._orig_keys = np.empty(0, dtype=np.uint32)
+        self._dirty = False
 
     def add_replacement(self, original: Tuple[int, int, int],
                        replacement: Tuple[int, int, int]) -> None:
@@ -42,6 +61,7 @@ class ColorReplacementManager:
             return
         
         self._replacements[original] = replacement
+        self._dirty = True
 
     def remove_replacement(self, original: Tuple[int, int, int]) -> bool:
         """
@@ -56,6 +76,7 @@ class ColorReplacementManager:
         original = self._validate_color(original)
         if original in self._replacements:
             del self._replacements[original]
+            self._dirty = True
             return True
         return False
 
@@ -85,18 +106,62 @@ class ColorReplacementManager:
         if len(self._replacements) == 0:
             return rgb_array.copy()
         
-        result = rgb_array.copy()
+        if self._dirty:
+            self._sync_arrays()
+        
+        # Fused JIT kernel: one pass over the pixels, no temporary masks
+        if NUMBA_AVAILABLE and rgb_array.dtype == np.uint8 and rgb_array.ndim == 3:
+            result = np.empty_like(rgb_array)
+            apply_replacements(rgb_array, self._orig_arr, self._repl_arr, result)
+            return result
         
-        for original, replacement in self._replacements.items():
-            # Create mask for pixels matching original color
-            mask = np.all(rgb_array == original, axis=-1)
-            result[mask] = replacement
+        if len(self._orig_arr) <= SMALL_MAPPING_COUNT:
+            result = rgb_array.copy()
+            for orig, repl in zip(self._orig_arr, self._repl_arr):
+                mask = (
+                    (rgb_array[..., 0] == orig[0])
+                    & (rgb_array[..., 1] == orig[1])
+                    & (rgb_array[..., 2] == orig[2])
+                )
+                result[mask] = repl
+            return result
+        
+        orig_keys = self._orig_keys
+        repl_vals = self._repl_arr
+        
+        # Single pass over the image: pack every pixel, then look it up
+        keys = self._pack_rgb(rgb_array)
+        pos = np.searchsorted(orig_keys, keys)
+        np.minimum(pos, len(orig_keys) - 1, out=pos)
+        hit = orig_keys[pos] == keys
+        
+        # Nothing to replace: skip the masked gather/scatter entirely
+        if not hit.any():
+            return rgb_array.copy()
+        
+        result = rgb_array.copy()
+        result[hit] = repl_vals[pos[hit]]
         
         return result
 
+    def _sync_arrays(self) -> None:
+        """Rebuild the cached originals/replacements arrays from _replacements."""
+        n = len(self._replacements)
+        orig_arr = np.array(list(self._replacements.keys()), dtype=np.uint8).reshape(n, 3)
+        repl_arr = np.array(list(self._replacements.values()), dtype=np.uint8).reshape(n, 3)
+        orig_keys = self._pack_rgb(orig_arr)
+        
+        # Sort by packed key so lookups can use searchsorted
+        order = np.argsort(orig_keys)
+        self._orig_arr = np.ascontiguousarray(orig_arr[order])
+        self._repl_arr = np.ascontiguousarray(repl_arr[order])
+        self._orig_keys = orig_keys[order]
+        self._dirty = False
+
     def clear(self) -> None:
         """Clear all color replacements."""
         self._replacements.clear()
+        self._dirty = True
 
     def __len__(self) -> int:
         """Return the number of color replacements."""
@@ -140,10 +205,15 @@ class ColorReplacementManager:
             New ColorReplacementManager instance with loaded mappings
         """
         manager = cls()
-        for orig_hex, repl_hex in data.items():
-            original = cls._hex_to_color(orig_hex)
-            replacement = cls._hex_to_color(repl_hex)
-            manager.add_replacement(original, replacement)
+        originals = cls._hex_list_to_colors(list(data.keys()))
+        replacements = cls._hex_list_to_colors(list(data.values()))
+        # Same-color mappings are ignored, as in add_replacement
+        manager._replacements.update(
+            (original, replacement)
+            for original, replacement in zip(originals, replacements)
+            if original != replacement
+        )
+        manager._dirty = True
         return manager
 
     @staticmethod
@@ -165,6 +235,30 @@ class ColorReplacementManager:
         
         return tuple(max(0, min(255, int(c))) for c in color)
 
+    @classmethod
+    def _hex_list_to_colors(cls, color_strs: List[str]) -> List[Tuple[int, int, int]]:
+        """
+        Convert many color strings to RGB tuples.
+        
+        Canonical '#RRGGBB' strings (what the palette emits) are decoded in a
+        single bytes.fromhex call; anything else goes through _hex_to_color.
+        """
+        if all(isinstance(c, str) and len(c) == 7 and c[0] == '#' for c in color_strs):
+            try:
+                packed = bytes.fromhex(''.join(c[1:] for c in color_strs))
+            except ValueError:
+                packed = b''
+            if len(packed) == 3 * len(color_strs):
+                rgb = np.frombuffer(packed, dtype=np.uint8).reshape(-1, 3)
+                return list(map(tuple, rgb.tolist()))
+        return [cls._validate_color(cls._hex_to_color(c)) for c in color_strs]
+
+    @staticmethod
+    def _pack_rgb(rgb_array: np.ndarray) -> np.ndarray:
+        """Pack an (..., 3) RGB array into (...) uint32 keys R<<16 | G<<8 | B."""
+        rgb = rgb_array.astype(np.uint32)
+        return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
     @staticmethod
     def _color_to_hex(color: Tuple[int, int, int]) -> str:
         """Convert RGB tuple to hex string."""
@@ -182,9 +276,8 @@ class ColorReplacementManager:
         
         # Handle rgb() or rgba() format from Gradio ColorPicker
         if hex_str.startswith('rgb'):
-            import re
             # Extract numbers from rgb(r, g, b) or rgba(r, g, b, a)
-            match = re.search(r'rgba?\s*\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)', hex_str)
+            match = _RGB_RE.search(hex_str)
             if match:
                 return (int(match.group(1)), int(match.group(2)), int(match.group(3)))
             raise ValueError(f"Invalid rgb format: {hex_str}")
@@ -193,8 +286,10 @@ class ColorReplacementManager:
         hex_str = hex_str.lstrip('#')
         if len(hex_str) != 6:
             raise ValueError(f"Invalid hex color: {hex_str}")
-        return (
-            int(hex_str[0:2], 16),
-            int(hex_str[2:4], 16),
-            int(hex_str[4:6], 16)
-        )
+        try:
+            b = bytes.fromhex(hex_str)
+        except ValueError:
+            raise ValueError(f"Invalid hex color: {hex_str}")
+        if len(b) != 3:
+            raise ValueError(f"Invalid hex color: {hex_str}")
+        return (b[0], b[1], b[2])
@@ -5,6 +5,8 @@ Coordinates modules to complete image-to-3D model conversion.
 """
 
 import os
+from functools import lru_cache
+
 import numpy as np
 import cv2
 import trimesh
@@ -58,33 +60,45 @@ def extract_lut_available_colors(lut_path: str) -> List[dict]:
         return []
     
     try:
-        # Load LUT data
-        lut_grid = np.load(lut_path)
-        measured_colors = lut_grid.reshape(-1, 3)
-        
-        # Get unique colors
-        unique_colors = np.unique(measured_colors, axis=0)
-        
-        # Build color list
-        colors = []
-        for color in unique_colors:
-            r, g, b = int(color[0]), int(color[1]), int(color[2])
-            colors.append({
-                'color': (r, g, b),
-                'hex': f'#{r:02x}{g:02x}{b:02x}'
-            })
-        
-        # Sort by brightness (dark to light) for better UX
-        colors.sort(key=lambda x: sum(x['color']))
-        
-        print(f"[LUT_COLORS] Extracted {len(colors)} unique colors from LUT")
-        return colors
-        
+        lut_mtime = os.path.getmtime(lut_path)
+        # Failures raise out of the cached loader, so they are never cached
+        return list(_load_lut_colors(lut_path, lut_mtime))
     except Exception as e:
         print(f"[LUT_COLORS] Error extracting colors from LUT: {e}")
         return []
 
 
+@lru_cache(maxsize=8)
+def _load_lut_colors(lut_path: str, lut_mtime: float) -> tuple:
+    """
+    Parse a LUT file into its sorted unique colors.
+    
+    Cached per (path, mtime) so re-saving the LUT invalidates the entry.
+    Raises on unreadable files; lru_cache does not store exceptions.
+    """
+    # Load LUT data
+    lut_grid = np.load(lut_path)
+    measured_colors = lut_grid.reshape(-1, 3)
+    
+    # Get unique colors
+    unique_colors = np.unique(measured_colors, axis=0)
+    
+    # Build color list
+    colors = []
+    for color in unique_colors:
+        r, g, b = int(color[0]), int(color[1]), int(color[2])
+        colors.append({
+            'color': (r, g, b),
+            'hex': f'#{r:02x}{g:02x}{b:02x}'
+        })
+    
+    # Sort by brightness (dark to light) for better UX
+    colors.sort(key=lambda x: sum(x['color']))
+    
+    print(f"[LUT_COLORS] Extracted {len(colors)} unique colors from LUT")
+    return tuple(colors)
+
+
 def get_lut_color_choices(lut_path: str) -> List[tuple]:
     """
     Get LUT colors formatted for Gradio Dropdown.
@@ -926,6 +940,7 @@ def generate_preview_cached(image_path, lut_path, target_width_mm,
     # Extract color palette from cache
     color_palette = extract_color_palette(cache)
     cache['color_palette'] = color_palette
+    cache['used_hex_set'] = frozenset(entry['hex'] for entry in color_palette)
     
     display = render_preview(
         preview_rgba, None, 0, 0, 0, 0, False, color_conf
@@ -1181,6 +1196,7 @@ def update_preview_with_replacements(cache, color_replacements: dict,
     # Re-extract palette with new colors
     color_palette = extract_color_palette(updated_cache)
     updated_cache['color_palette'] = color_palette
+    updated_cache['used_hex_set'] = frozenset(entry['hex'] for entry in color_palette)
     
     # Render display with loop if enabled
     display = render_preview(
@@ -1201,6 +1217,39 @@ def update_preview_with_replacements(cache, color_replacements: dict,
 
 # ========== Color Highlight Functions ==========
 
+# Highlight border color (cyan, alpha 200) as one RGBA pixel for uint32 views
+_HIGHLIGHT_BORDER_PX = np.array([0, 255, 255, 200], dtype=np.uint8).view(np.uint32)[0]
+
+
+def _highlight_base(cache, matched_rgb, mask_solid):
+    """
+    Per-image data shared by every highlight click.
+    
+    Returns the packed R<<16|G<<8|B keys, the dimmed RGBA background
+    (grayscale * 0.4 + 80, alpha 180 on solid pixels) and the image as opaque
+    RGBA. Stored in the cache tagged with the arrays it was built from, since
+    replacement updates copy the cache dict and swap matched_rgb.
+    """
+    entry = cache.get('_highlight_base')
+    if entry is not None and entry[0] is matched_rgb and entry[1] is mask_solid:
+        return entry[2:]
+    
+    rgb = matched_rgb.astype(np.uint32)
+    packed_rgb = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+    
+    dimmed_rgba = np.zeros(matched_rgb.shape[:2] + (4,), dtype=np.uint8)
+    gray_values = np.mean(matched_rgb[mask_solid], axis=1).astype(np.uint8)
+    dimmed_rgba[mask_solid, :3] = (gray_values * 0.4 + 80).astype(np.uint8)[:, None]
+    dimmed_rgba[mask_solid, 3] = 180  # Semi-transparent
+    
+    opaque_rgba = np.empty_like(dimmed_rgba)
+    opaque_rgba[..., :3] = matched_rgb
+    opaque_rgba[..., 3] = 255
+    
+    cache['_highlight_base'] = (matched_rgb, mask_solid, packed_rgb, dimmed_rgba, opaque_rgba)
+    return packed_rgb, dimmed_rgba, opaque_rgba
+
+
 def generate_highlight_preview(cache, highlight_color: str, 
                                loop_pos=None, add_loop=False,
                                loop_width=4, loop_length=8, 
@@ -1253,7 +1302,6 @@ def generate_highlight_preview(cache, highlight_color: str,
         r = int(highlight_hex[1:3], 16)
         g = int(highlight_hex[3:5], 16)
         b = int(highlight_hex[5:7], 16)
-        highlight_rgb = np.array([r, g, b], dtype=np.uint8)
     except (ValueError, IndexError):
         return None, f"❌ 无效的颜色值 | Invalid color: {highlight_color}"
     
@@ -1265,11 +1313,11 @@ def generate_highlight_preview(cache, highlight_color: str,
     if matched_rgb is None or mask_solid is None:
         return None, "❌ 缓存数据不完整 | Incomplete cache"
     
-    target_h, target_w = matched_rgb.shape[:2]
+    packed_rgb, dimmed_rgba, opaque_rgba = _highlight_base(cache, matched_rgb, mask_solid)
     
     # Create highlight mask - pixels matching the highlight color
-    color_match = np.all(matched_rgb == highlight_rgb, axis=2)
-    highlight_mask = color_match & mask_solid
+    highlight_key = (r << 16) | (g << 8) | b
+    highlight_mask = (packed_rgb == highlight_key) & mask_solid
     
     # Count highlighted pixels
     highlight_count = np.sum(highlight_mask)
@@ -1280,25 +1328,13 @@ def generate_highlight_preview(cache, highlight_color: str,
     
     highlight_percentage = round(highlight_count / total_solid * 100, 2)
     
-    # Create highlighted preview
-    # Option 1: Dim non-highlighted areas (grayscale + reduced opacity)
-    preview_rgba = np.zeros((target_h, target_w, 4), dtype=np.uint8)
-    
-    # For non-highlighted solid pixels: convert to grayscale and dim
-    non_highlight_mask = mask_solid & ~highlight_mask
-    if np.any(non_highlight_mask):
-        # Convert to grayscale
-        gray_values = np.mean(matched_rgb[non_highlight_mask], axis=1).astype(np.uint8)
-        # Apply dimming (mix with darker gray)
-        dimmed_gray = (gray_values * 0.4 + 80).astype(np.uint8)
-        preview_rgba[non_highlight_mask, 0] = dimmed_gray
-        preview_rgba[non_highlight_mask, 1] = dimmed_gray
-        preview_rgba[non_highlight_mask, 2] = dimmed_gray
-        preview_rgba[non_highlight_mask, 3] = 180  # Semi-transparent
+    # Create highlighted preview: dimmed background with the color shown as-is.
+    # Pixels are written whole through a uint32 view of the RGBA buffer.
+    preview_rgba = dimmed_rgba.copy()
+    preview_px = preview_rgba.view(np.uint32)[..., 0]
     
     # For highlighted pixels: show original color with full opacity
-    preview_rgba[highlight_mask, :3] = matched_rgb[highlight_mask]
-    preview_rgba[highlight_mask, 3] = 255
+    np.copyto(preview_px, opaque_rgba.view(np.uint32)[..., 0], where=highlight_mask)
     
     # Add a subtle colored border/glow effect around highlighted regions
     # by dilating the highlight mask and drawing a border
@@ -1309,11 +1345,7 @@ def generate_highlight_preview(cache, highlight_color: str,
         border_mask = (dilated > 0) & ~highlight_mask & mask_solid
         
         # Draw border in a contrasting color (cyan for visibility)
-        if np.any(border_mask):
-            preview_rgba[border_mask, 0] = 0    # R
-            preview_rgba[border_mask, 1] = 255  # G
-            preview_rgba[border_mask, 2] = 255  # B
-            preview_rgba[border_mask, 3] = 200  # Alpha
+        np.copyto(preview_px, _HIGHLIGHT_BORDER_PX, where=border_mask)
     except Exception as e:
         print(f"[HIGHLIGHT] Border effect skipped: {e}")
     
@@ -1359,13 +1391,24 @@ def clear_highlight_preview(cache, loop_pos=None, add_loop=False,
     
     print(f"[CLEAR_HIGHLIGHT] preview_rgba shape: {preview_rgba.shape}")
     
-    color_conf = cache['color_conf']
-    display = render_preview(
-        preview_rgba,
-        loop_pos if add_loop else None,
-        loop_width, loop_length, loop_hole, loop_angle,
-        add_loop, color_conf
+    # Highlight on/off toggles keep landing here with the same preview and
+    # loop settings; reuse the last render while those are unchanged
+    loop_key = (
+        tuple(loop_pos) if loop_pos is not None else None,
+        add_loop, loop_width, loop_length, loop_hole, loop_angle
     )
+    baseline = cache.get('_baseline_preview')
+    if baseline is not None and baseline[0] is preview_rgba and baseline[1] == loop_key:
+        display = baseline[2]
+    else:
+        color_conf = cache['color_conf']
+        display = render_preview(
+            preview_rgba,
+            loop_pos if add_loop else None,
+            loop_width, loop_length, loop_hole, loop_angle,
+            add_loop, color_conf
+        )
+        cache['_baseline_preview'] = (preview_rgba, loop_key, display)
     
     print(f"[CLEAR_HIGHLIGHT] display shape: {display.shape if display is not None else None}")
     
@@ -5,6 +5,10 @@ Extracts color data from printed calibration boards.
 """
 
 import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
 import numpy as np
 import cv2
 import gradio as gr
@@ -20,8 +24,13 @@ from config import (
 from utils import Stats
 
 
+@lru_cache(maxsize=1)
 def generate_simulated_reference():
-    """Generate reference image for visual comparison."""
+    """Generate reference image for visual comparison.
+
+    The result is cached for the process and returned read-only, so every
+    caller shares one array; copy it before drawing on it.
+    """
     colors = {
         0: np.array([250, 250, 250]),
         1: np.array([220, 20, 60]),
@@ -41,7 +50,9 @@ def generate_simulated_reference():
         mixed = sum(colors[mid] for mid in stack) / 5.0
         ref_img[i // DATA_GRID_SIZE, i % DATA_GRID_SIZE] = mixed.astype(np.uint8)
 
-    return cv2.resize(ref_img, (512, 512), interpolation=cv2.INTER_NEAREST)
+    ref_img = cv2.resize(ref_img, (512, 512), interpolation=cv2.INTER_NEAREST)
+    ref_img.flags.writeable = False
+    return ref_img
 
 
 def rotate_image(img, direction):
@@ -106,8 +117,12 @@ def apply_auto_white_balance(img):
     m = 50
     corners = [img[0:m, 0:m], img[0:m, w-m:w], img[h-m:h, 0:m], img[h-m:h, w-m:w]]
     avg_white = sum(c.mean(axis=(0, 1)) for c in corners) / 4.0
-    gain = np.array([255, 255, 255]) / (avg_white + 1e-5)
-    return np.clip(img.astype(float) * gain, 0, 255).astype(np.uint8)
+    gain = (255.0 / (avg_white + 1e-5)).astype(np.float32)
+    # Scale in float32, in place; the result is 8-bit anyway
+    out = img.astype(np.float32)
+    out *= gain
+    np.clip(out, 0, 255, out=out)
+    return out.astype(np.uint8)
 
 
 def apply_brightness_correction(img):
@@ -120,16 +135,128 @@ def apply_brightness_correction(img):
     tl, tr = l[0:m, 0:m].mean(), l[0:m, w-m:w].mean()
     bl, br = l[h-m:h, 0:m].mean(), l[h-m:h, w-m:w].mean()
 
-    top = np.linspace(tl, tr, w)
-    bot = np.linspace(bl, br, w)
-    mask = np.array([top * (1 - y/h) + bot * (y/h) for y in range(h)])
+    top = np.linspace(tl, tr, w, dtype=np.float32)
+    bot = np.linspace(bl, br, w, dtype=np.float32)
+    t = (np.arange(h, dtype=np.float32) / h)[:, None]
+    mask = top * (1 - t) + bot * t
 
-    target = (tl + tr + bl + br) / 4.0
-    l_new = np.clip(l.astype(float) * (target / (mask + 1e-5)), 0, 255).astype(np.uint8)
+    target = np.float32((tl + tr + bl + br) / 4.0)
+    gain = target / (mask + np.float32(1e-5))
+    gain *= l
+    np.clip(gain, 0, 255, out=gain)
+    l_new = gain.astype(np.uint8)
 
     return cv2.cvtColor(cv2.merge([l_new, a, b]), cv2.COLOR_LAB2RGB)
 
 
+# Recent warped + corrected boards, keyed by (id(img), points, grid, wb, bright).
+# The sliders only move the sampling grid, so re-extracting after a slider
+# release reuses the board. Each entry holds its source image so that id
+# cannot be reused while cached.
+_WARP_CACHE = OrderedDict()
+_WARP_CACHE_SIZE = 4
+_WARP_CACHE_LOCK = threading.Lock()  # Gradio handlers run in worker threads
+
+
+def _warp_board(img, points, physical_grid, wb, bright):
+    """Perspective-correct the board photo and apply the optional corrections.
+
+    Returns a cached array shared between calls; callers must not modify it.
+    """
+    key = (id(img), tuple(map(tuple, points)), physical_grid, bool(wb), bool(bright))
+    with _WARP_CACHE_LOCK:
+        hit = _WARP_CACHE.get(key)
+        if hit is not None and hit[0] is img:
+            _WARP_CACHE.move_to_end(key)
+            return hit[1]
+
+    half = DST_SIZE / physical_grid / 2.0
+    src = np.float32(points)
+    dst = np.float32([
+        [half, half], [DST_SIZE - half, half],
+        [DST_SIZE - half, DST_SIZE - half], [half, DST_SIZE - half]
+    ])
+
+    M = cv2.getPerspectiveTransform(src, dst)
+    warped = cv2.warpPerspective(img, M, (DST_SIZE, DST_SIZE))
+
+    if wb:
+        warped = apply_auto_white_balance(warped)
+    if bright:
+        warped = apply_brightness_correction(warped)
+
+    warped.flags.writeable = False
+    with _WARP_CACHE_LOCK:
+        _WARP_CACHE[key] = (img, warped)
+        if len(_WARP_CACHE) > _WARP_CACHE_SIZE:
+            _WARP_CACHE.popitem(last=False)
+    return warped
+
+
+# Recent sampling results, keyed by (id(warped board), grid, slider values), so
+# releasing a slider back onto an earlier setting is a lookup. Each entry
+# holds its board so that id cannot be reused while cached.
+_SAMPLE_CACHE = OrderedDict()
+_SAMPLE_CACHE_SIZE = 8
+_SAMPLE_CACHE_LOCK = threading.Lock()  # Gradio handlers run in worker threads
+
+
+def _sample_board(warped, grid_size, physical_grid, offset_x, offset_y, zoom, barrel):
+    """Average each data cell of the warped board and mark the sample points.
+
+    Returns:
+        tuple: (visualization, extracted) read-only arrays shared between
+        calls; extracted is the (grid_size, grid_size, 3) uint8 LUT.
+    """
+    key = (id(warped), grid_size, physical_grid, offset_x, offset_y, zoom, barrel)
+    with _SAMPLE_CACHE_LOCK:
+        hit = _SAMPLE_CACHE.get(key)
+        if hit is not None and hit[0] is warped:
+            _SAMPLE_CACHE.move_to_end(key)
+            return hit[1], hit[2]
+
+    # Sample centres for every data cell at once. Data cells sit inside a
+    # one-cell border (4-color and 6-color alike), hence the +1
+    phys = np.arange(grid_size) + 1
+    nx = (phys[None, :] + 0.5) / physical_grid * 2 - 1
+    ny = (phys[:, None] + 0.5) / physical_grid * 2 - 1
+
+    rad = np.sqrt(nx**2 + ny**2)
+    k = 1 + barrel * (rad**2)
+    dx, dy = nx * k * zoom, ny * k * zoom
+
+    cx = (dx + 1) / 2 * DST_SIZE + offset_x
+    cy = (dy + 1) / 2 * DST_SIZE + offset_y
+    inside = (cx >= 0) & (cx < DST_SIZE) & (cy >= 0) & (cy < DST_SIZE)
+
+    # Mean of the 8x8 window around each centre (clipped to the board),
+    # read off a summed-area table instead of slicing per cell
+    x0 = np.maximum(0, cx - 4).astype(int)
+    y0 = np.maximum(0, cy - 4).astype(int)
+    x1 = np.clip(cx + 4, 0, DST_SIZE).astype(int)
+    y1 = np.clip(cy + 4, 0, DST_SIZE).astype(int)
+    x0, y0 = np.minimum(x0, x1), np.minimum(y0, y1)
+
+    sat = cv2.integral(warped)
+    sums = sat[y1, x1] - sat[y0, x1] - sat[y1, x0] + sat[y0, x0]
+    count = ((x1 - x0) * (y1 - y0))[..., None]
+    avg = np.divide(sums, count, out=np.zeros(sums.shape), where=count > 0)
+
+    extracted = np.where(inside[..., None], avg.astype(int), 0).astype(np.uint8)
+
+    vis = warped.copy()
+    for px, py in zip(cx[inside].astype(int), cy[inside].astype(int)):
+        cv2.drawMarker(vis, (int(px), int(py)), (0, 255, 0), cv2.MARKER_CROSS, 8, 1)
+
+    vis.flags.writeable = False
+    extracted.flags.writeable = False
+    with _SAMPLE_CACHE_LOCK:
+        _SAMPLE_CACHE[key] = (warped, vis, extracted)
+        if len(_SAMPLE_CACHE) > _SAMPLE_CACHE_SIZE:
+            _SAMPLE_CACHE.popitem(last=False)
+    return vis, extracted
+
+
 def run_extraction(img, points, offset_x, offset_y, zoom, barrel, wb, bright, color_mode="CMYW"):
     """
     Main extraction pipeline with dynamic grid size support.
@@ -165,53 +292,12 @@ def run_extraction(img, points, offset_x, offset_y, zoom, barrel, wb, bright, co
     
     print(f"[EXTRACTOR] Mode: {color_mode}, Logic: {grid_size}x{grid_size} inside {physical_grid}x{physical_grid}")
 
-    # Perspective transform
-    half = DST_SIZE / physical_grid / 2.0
-    src = np.float32(points)
-    dst = np.float32([
-        [half, half], [DST_SIZE - half, half],
-        [DST_SIZE - half, DST_SIZE - half], [half, DST_SIZE - half]
-    ])
-
-    M = cv2.getPerspectiveTransform(src, dst)
-    warped = cv2.warpPerspective(img, M, (DST_SIZE, DST_SIZE))
-
-    if wb:
-        warped = apply_auto_white_balance(warped)
-    if bright:
-        warped = apply_brightness_correction(warped)
+    # Perspective transform + corrections (independent of the sliders)
+    warped = _warp_board(img, points, physical_grid, wb, bright)
 
     # Sampling
-    extracted = np.zeros((grid_size, grid_size, 3), dtype=np.uint8)
-    vis = warped.copy()
-
-    for r in range(grid_size):
-        for c in range(grid_size):
-            # 【关键】计算物理位置时的偏移
-            # 无论是 4色 还是 6色，因为都有 1 格边框，所以都需要 +1
-            phys_r = r + 1
-            phys_c = c + 1
-            
-            # 归一化坐标 [-1, 1] (基于 physical_grid)
-            nx = (phys_c + 0.5) / physical_grid * 2 - 1
-            ny = (phys_r + 0.5) / physical_grid * 2 - 1
-
-            rad = np.sqrt(nx**2 + ny**2)
-            k = 1 + barrel * (rad**2)
-            dx, dy = nx * k * zoom, ny * k * zoom
-
-            cx = (dx + 1) / 2 * DST_SIZE + offset_x
-            cy = (dy + 1) / 2 * DST_SIZE + offset_y
-
-            if 0 <= cx < DST_SIZE and 0 <= cy < DST_SIZE:
-                x0, y0 = int(max(0, cx - 4)), int(max(0, cy - 4))
-                x1, y1 = int(min(DST_SIZE, cx + 4)), int(min(DST_SIZE, cy + 4))
-                reg = warped[y0:y1, x0:x1]
-                avg = reg.mean(axis=(0, 1)).astype(int) if reg.size > 0 else [0, 0, 0]
-                cv2.drawMarker(vis, (int(cx), int(cy)), (0, 255, 0), cv2.MARKER_CROSS, 8, 1)
-            else:
-                avg = [0, 0, 0]
-            extracted[r, c] = avg
+    vis, extracted = _sample_board(warped, grid_size, physical_grid,
+                                   offset_x, offset_y, zoom, barrel)
 
     np.save(LUT_FILE_PATH, extracted)
     prev = cv2.resize(extracted, (512, 512), interpolation=cv2.INTER_NEAREST)
@@ -230,10 +316,12 @@ def probe_lut_cell(evt: gr.SelectData):
     except:
         return "⚠️ 数据损坏", None, None
 
+    # Grid size from the LUT itself: 32x32 for 4-color, 36x36 for 6-color
+    grid = lut.shape[0]
     x, y = evt.index
-    scale = 512 / DATA_GRID_SIZE
-    c = min(max(int(x / scale), 0), DATA_GRID_SIZE - 1)
-    r = min(max(int(y / scale), 0), DATA_GRID_SIZE - 1)
+    scale = 512 / grid
+    c = min(max(int(x / scale), 0), grid - 1)
+    r = min(max(int(y / scale), 0), grid - 1)
 
     rgb = lut[r, c]
     hex_c = '#{:02x}{:02x}{:02x}'.format(*rgb)
@@ -265,11 +353,12 @@ def manual_fix_cell(coord, color_input):
             parts = clean.split(',')
             if len(parts) >= 3:
                 new_color = [int(float(p.strip())) for p in parts[:3]]
-        elif color_str.startswith('#'):
-            hex_s = color_str.lstrip('#')
-            new_color = [int(hex_s[i:i+2], 16) for i in (0, 2, 4)]
         else:
-            new_color = [int(color_str[i:i+2], 16) for i in (0, 2, 4)]
+            # '#RRGGBB', 'RRGGBB' or with a trailing alpha byte
+            hex_s = color_str.lstrip('#')[:6]
+            if len(hex_s) != 6:
+                raise ValueError(color_str)
+            new_color = list(bytes.fromhex(hex_s))
 
         lut[r, c] = new_color
         np.save(LUT_FILE_PATH, lut)
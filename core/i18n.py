@@ -742,9 +742,12 @@ Special thanks to:
         Returns:
             str: Translated text, returns key itself if key doesn't exist
         """
-        if key in I18n.TEXTS:
-            return I18n.TEXTS[key].get(lang, I18n.TEXTS[key].get('zh', key))
-        return key
+        entry = I18n.TEXTS.get(key)
+        if entry is None:
+            return key
+        # Resolve the 'zh' fallback only when the language is missing
+        text = entry.get(lang)
+        return text if text is not None else entry.get('zh', key)
     
     @staticmethod
     def get_all(lang: str = 'zh') -> dict:
@@ -165,9 +165,6 @@ class LuminaImageProcessor:
         except Exception as e:
             raise ValueError(f"❌ LUT file corrupted: {e}")
         
-        valid_rgb = []
-        valid_stacks = []
-        
         print(f"[IMAGE_PROCESSOR] Loading LUT with {total_colors} points...")
         
         # Branch 1: 6-Color Smart 1296
@@ -208,33 +205,20 @@ class LuminaImageProcessor:
             
             # Keep original outlier filtering logic (Blue Check)
             base_blue = np.array([30, 100, 200])
-            dropped = 0
+            num_points = min(1024, total_colors)
             
-            for i in range(1024):
-                if i >= total_colors:
-                    break
-                
-                # Rebuild 4-base stacking (0..1023)
-                digits = []
-                temp = i
-                for _ in range(5):
-                    digits.append(temp % 4)
-                    temp //= 4
-                stack = digits[::-1]
-                
-                real_rgb = measured_colors[i]
-                
-                # Filter outliers: close to blue but doesn't contain blue
-                dist = np.linalg.norm(real_rgb - base_blue)
-                if dist < 60 and 3 not in stack:  # 3 is Blue in RYBW/CMYW
-                    dropped += 1
-                    continue
-                
-                valid_rgb.append(real_rgb)
-                valid_stacks.append(stack)
+            # Rebuild 4-base stacking (0..1023), most significant digit first
+            idx = np.arange(num_points)[:, None]
+            stacks = (idx // (4 ** np.arange(4, -1, -1))) % 4
+            lut_colors = measured_colors[:num_points]
+            
+            # Filter outliers: close to blue but doesn't contain blue
+            dists = np.linalg.norm(lut_colors - base_blue, axis=1)
+            keep = ~((dists < 60) & (stacks != 3).all(axis=1))  # 3 is Blue in RYBW/CMYW
+            dropped = int(np.count_nonzero(~keep))
             
-            self.lut_rgb = np.array(valid_rgb)
-            self.ref_stacks = np.array(valid_stacks)
+            self.lut_rgb = lut_colors[keep]
+            self.ref_stacks = stacks[keep]
             
             print(f"✅ LUT loaded: {len(self.lut_rgb)} colors (filtered {dropped} outliers)")
         
@@ -383,9 +367,12 @@ class LuminaImageProcessor:
         # Background removal - combine alpha transparency with optional auto-bg
         mask_transparent = mask_transparent_initial.copy()
         if auto_bg:
-            bg_color = bg_reference[0, 0]
-            diff = np.sum(np.abs(bg_reference - bg_color), axis=-1)
-            mask_transparent = np.logical_or(mask_transparent, diff < bg_tol)
+            # L1 distance to the corner color; int16 holds the 0-765 range
+            bg = bg_reference.astype(np.int16)
+            bg -= bg[0, 0]
+            np.abs(bg, out=bg)
+            diff = bg.sum(axis=-1, dtype=np.int16)
+            np.logical_or(mask_transparent, diff < bg_tol, out=mask_transparent)
         
         # Apply transparency mask to material matrix
         material_matrix[mask_transparent] = -1
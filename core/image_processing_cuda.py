@@ -4,14 +4,16 @@ GPU-accelerated image processing module using PyTorch
 Supports 4-Color and 6-Color modes
 """
 
+import hashlib
+
 import numpy as np
 import cv2
 from PIL import Image
-from scipy.spatial import KDTree
 
 # Try to import torch with error handling
 try:
     import torch
+    import torch.nn.functional as F
     TORCH_AVAILABLE = True
 except ImportError:
     TORCH_AVAILABLE = False
@@ -19,6 +21,255 @@ except ImportError:
 
 from config import PrinterConfig
 
+# Pixels per block for the CPU brute-force LUT search (bounds the distance matrix)
+CPU_MATCH_CHUNK = 16384
+
+# Pixels per batch for GPU pixel-mode matching (65536 x 1024 FP32 = 256 MB scores)
+GPU_MATCH_CHUNK = 65536
+
+# Output pixels per GPU bilateral tile (65536 px x 81 taps x 3 ch FP32 = 64 MB patches)
+BILATERAL_TILE_PIXELS = 65536
+
+# Pixel-mode nearest-LUT-index tables (packed 24-bit RGB -> index, -1 = not
+# matched yet), keyed by LUT digest and shared across processor instances.
+# Indices are int16, so LUTs over 32767 colors need a wider table
+_PIXEL_NN_TABLES = {}
+_PIXEL_NN_MAX_TABLES = 2
+
+# On CPU, palettes up to this size use the octree quantizer instead of K-Means
+OCTREE_MAX_COLORS = 64
+
+
+def _octree_quantize(pixels, k):
+    """
+    Octree color quantization (ImageMagick-style) of (N, 3) pixels to k colors
+    
+    Pixels are binned once into a 64x64x64 histogram (octree depth 6). Leaves
+    are then reduced bottom-up: at the deepest level, sibling groups with the
+    lowest total pixel count are merged into their parent first, until exactly
+    k leaves remain (fewer only if fewer bins are occupied). Each leaf color
+    is the mean of the pixels it holds.
+    
+    Returns:
+        tuple: (labels, palette) - (N,) leaf index per pixel, (L, 3) uint8 colors
+    """
+    rgb = np.asarray(pixels).reshape(-1, 3).astype(np.int64)
+    bins = ((rgb[:, 0] >> 2) << 12) | ((rgb[:, 1] >> 2) << 6) | (rgb[:, 2] >> 2)
+    
+    # Histogram: pixel count and RGB sums per occupied bin
+    hist = np.bincount(bins, minlength=1 << 18)
+    occupied = np.nonzero(hist)[0]
+    count = hist[occupied].astype(np.float64)
+    sums = np.stack([
+        np.bincount(bins, weights=rgb[:, c], minlength=1 << 18)[occupied]
+        for c in range(3)
+    ], axis=1)
+    
+    # Leaves start as the occupied depth-6 bins
+    comps = np.stack([occupied >> 12, (occupied >> 6) & 63, occupied & 63], axis=1)
+    depth = np.full(len(occupied), 6)
+    bin_to_leaf = np.arange(len(occupied))
+    
+    while len(depth) > k:
+        deepest = depth.max()
+        sel = np.nonzero(depth == deepest)[0]
+        parents = comps[sel] >> 1
+        parent_keys = (parents[:, 0] << 12) | (parents[:, 1] << 6) | parents[:, 2]
+        _, group, group_size = np.unique(parent_keys, return_inverse=True, return_counts=True)
+        group = group.reshape(-1)
+        group_count = np.bincount(group, weights=count[sel])
+        
+        # Merge the lightest sibling groups until enough leaves are removed
+        excess = len(depth) - k
+        order = np.argsort(group_count, kind='stable')
+        removed = np.cumsum(group_size[order] - 1)
+        n_merge = min(len(order), int(np.searchsorted(removed, excess)) + 1)
+        merged = np.zeros(len(group_size), dtype=bool)
+        merged[order[:n_merge]] = True
+        merged_ids = np.nonzero(merged)[0]
+        child_merged = merged[group]
+        
+        # If merging the whole last group would overshoot k, fold only its
+        # lightest children into the parent and keep the rest as leaves
+        overshoot = int(removed[n_merge - 1]) - excess
+        if overshoot > 0:
+            last = np.nonzero(group == order[n_merge - 1])[0]
+            heaviest = last[np.argsort(count[sel[last]], kind='stable')][-overshoot:]
+            child_merged[heaviest] = False
+        
+        # New parent leaves, one per merged group
+        group_rank = np.cumsum(merged) - 1
+        dropped = sel[child_merged]
+        drop = np.zeros(len(depth), dtype=bool)
+        drop[dropped] = True
+        keep = np.nonzero(~drop)[0]
+        
+        old_to_new = np.empty(len(depth), dtype=np.int64)
+        old_to_new[keep] = np.arange(len(keep))
+        old_to_new[dropped] = len(keep) + group_rank[group[child_merged]]
+        
+        first_child = np.zeros(len(group_size), dtype=np.int64)
+        first_child[group[::-1]] = sel[::-1]
+        new_comps = comps[first_child[merged_ids]] >> 1
+        new_count = np.bincount(group[child_merged], weights=count[dropped],
+                                minlength=len(group_size))[merged_ids]
+        new_sums = np.stack([
+            np.bincount(group[child_merged], weights=sums[dropped, c],
+                        minlength=len(group_size))[merged_ids]
+            for c in range(3)
+        ], axis=1)
+        
+        comps = np.concatenate([comps[keep], new_comps])
+        depth = np.concatenate([depth[keep], np.full(len(merged_ids), deepest - 1)])
+        count = np.concatenate([count[keep], new_count])
+        sums = np.concatenate([sums[keep], new_sums])
+        bin_to_leaf = old_to_new[bin_to_leaf]
+    
+    palette = np.clip(np.rint(sums / count[:, None]), 0, 255).astype(np.uint8)
+    
+    bin_table = np.zeros(1 << 18, dtype=np.int64)
+    bin_table[occupied] = bin_to_leaf
+    return bin_table[bins], palette
+
+
+def _refine_palette(pixels, labels, palette, max_iter=10):
+    """
+    Lloyd (K-Means) passes over an octree palette, seeded with its labels
+    
+    The octree gives a good starting partition in one histogram pass; a few
+    K-Means iterations from there bring the error in line with a full
+    K-Means++ run at a fraction of the cost (one attempt, no seeding).
+    
+    Returns:
+        tuple: (labels, palette) - (N,) int32 labels, (k, 3) uint8 colors
+    """
+    data = np.asarray(pixels, dtype=np.float32).reshape(-1, 3)
+    best_labels = np.ascontiguousarray(labels, dtype=np.int32).reshape(-1, 1)
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, max_iter, 0.2)
+    _, best_labels, centers = cv2.kmeans(
+        data, len(palette), best_labels, criteria, 1, cv2.KMEANS_USE_INITIAL_LABELS
+    )
+    return best_labels.reshape(-1), np.clip(np.rint(centers), 0, 255).astype(np.uint8)
+
+
+def _kmeans_step(pixels, pixels_unit, centroids):
+    """
+    One K-Means iteration: assign labels, recompute centroids, measure the shift
+    
+    Distances are computed from pixels_unit (RGB scaled to 0-1, FP16 on GPU)
+    as |c|^2 - 2*p.c, which has the same argmin as the Euclidean distance.
+    Per-cluster sums and counts are accumulated in FP32 with scatter_add_ so
+    the step is free of data-dependent shapes; empty clusters keep their
+    previous centroid.
+    
+    Returns:
+        tuple: (labels, new_centroids, shift)
+    """
+    centroids_unit = (centroids / 255.0).to(pixels_unit.dtype)
+    distances = (centroids_unit * centroids_unit).sum(dim=1) - 2 * (pixels_unit @ centroids_unit.T)
+    labels = torch.argmin(distances, dim=1)
+    
+    sums = torch.zeros_like(centroids)
+    sums.scatter_add_(0, labels.unsqueeze(1).expand(-1, 3), pixels)
+    counts = torch.zeros_like(centroids[:, :1])
+    counts.scatter_add_(0, labels.unsqueeze(1), torch.ones_like(pixels[:, :1]))
+    new_centroids = torch.where(counts > 0, sums / counts.clamp(min=1), centroids)
+    
+    shift = torch.norm(new_centroids - centroids)
+    return labels, new_centroids, shift
+
+
+# torch.compile'd K-Means step, built on first use (None = not built yet)
+_kmeans_step_compiled = None
+
+
+def _get_kmeans_step():
+    """Return the fused (torch.compile) K-Means step, or the eager one if unsupported."""
+    global _kmeans_step_compiled
+    if _kmeans_step_compiled is None:
+        try:
+            _kmeans_step_compiled = torch.compile(_kmeans_step)
+        except Exception as e:
+            print(f"[CUDA] torch.compile unavailable ({e}), using eager K-Means step")
+            _kmeans_step_compiled = _kmeans_step
+    return _kmeans_step_compiled
+
+
+def _disable_compiled_kmeans_step():
+    """Fall back to the eager K-Means step for the rest of the session."""
+    global _kmeans_step_compiled
+    _kmeans_step_compiled = _kmeans_step
+    return _kmeans_step
+
+
+def _read_rgba(image_path):
+    """
+    Decode an image file straight to an (H, W, 4) uint8 RGBA array with OpenCV
+    
+    np.fromfile + cv2.imdecode keeps non-ASCII paths working on Windows.
+    Grayscale and 16-bit inputs are normalized to 8-bit RGBA; formats OpenCV
+    cannot decode (e.g. GIF) fall back to PIL.
+    """
+    raw = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if raw is None:
+        return np.array(Image.open(image_path).convert('RGBA'))
+    
+    if raw.dtype == np.uint16:
+        raw = (raw >> 8).astype(np.uint8)
+    elif raw.dtype != np.uint8:
+        raw = cv2.normalize(raw, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    
+    if raw.ndim == 2:
+        return cv2.cvtColor(raw, cv2.COLOR_GRAY2RGBA)
+    if raw.shape[2] == 3:
+        return cv2.cvtColor(raw, cv2.COLOR_BGR2RGBA)
+    return cv2.cvtColor(raw, cv2.COLOR_BGRA2RGBA)
+
+
+def _bilateral_torch(img_gpu, d=9, sigma=10):
+    """
+    Bilateral filter on the GPU, matching cv2.bilateralFilter(d, sigma, sigma)
+    
+    Each output pixel is the average of its d x d neighbourhood (circular
+    window, reflect-101 borders like OpenCV) weighted by a spatial Gaussian
+    and a range Gaussian on the L1 color difference. Neighbourhoods are built
+    with F.unfold in row tiles of BILATERAL_TILE_PIXELS output pixels so the
+    patch tensor stays bounded regardless of image size.
+    
+    Args:
+        img_gpu: (H, W, 3) uint8 or float tensor on the target device
+        d: Window diameter
+        sigma: Used as both sigmaColor and sigmaSpace
+    
+    Returns:
+        (H, W, 3) uint8 tensor on the same device
+    """
+    h, w = img_gpu.shape[:2]
+    radius = d // 2
+    d = 2 * radius + 1
+    img = img_gpu.float().permute(2, 0, 1).unsqueeze(0)
+    padded = F.pad(img, (radius, radius, radius, radius), mode='reflect')
+    
+    offsets = torch.arange(-radius, radius + 1, device=img.device, dtype=torch.float32)
+    dist2 = offsets.view(-1, 1) ** 2 + offsets.view(1, -1) ** 2
+    spatial = torch.exp(-dist2 / (2 * sigma * sigma))
+    spatial = torch.where(dist2 <= radius * radius, spatial, torch.zeros_like(spatial))
+    spatial = spatial.reshape(-1, 1)
+    range_coeff = -1.0 / (2 * sigma * sigma)
+    
+    out = torch.empty((3, h, w), device=img.device, dtype=torch.float32)
+    rows = max(1, BILATERAL_TILE_PIXELS // w)
+    for y0 in range(0, h, rows):
+        y1 = min(h, y0 + rows)
+        patches = F.unfold(padded[:, :, y0:y1 + 2 * radius, :], d).view(3, d * d, -1)
+        center = img[0, :, y0:y1, :].reshape(3, 1, -1)
+        color_dist = (patches - center).abs().sum(dim=0)
+        weights = spatial * torch.exp(color_dist * color_dist * range_coeff)
+        filtered = (patches * weights).sum(dim=1) / weights.sum(dim=0)
+        out[:, y0:y1, :] = filtered.view(3, y1 - y0, w)
+    
+    return out.round_().clamp_(0, 255).to(torch.uint8).permute(1, 2, 0)
+
 
 class LuminaImageProcessorCUDA:
     """
@@ -38,7 +289,6 @@ class LuminaImageProcessorCUDA:
         self.color_mode = color_mode
         self.lut_rgb = None
         self.ref_stacks = None
-        self.kdtree = None
         
         # Check GPU availability (CUDA for NVIDIA, ROCm for AMD)
         if TORCH_AVAILABLE:
@@ -87,39 +337,36 @@ class LuminaImageProcessorCUDA:
         except Exception as e:
             raise ValueError(f"LUT file corrupted: {e}")
         
-        valid_rgb, valid_stacks = [], []
         base_blue = np.array([30, 100, 200])
-        dropped = 0
-        
-        # Filter outliers
-        for i in range(1024):
-            digits = []
-            temp = i
-            for _ in range(5):
-                digits.append(temp % 4)
-                temp //= 4
-            stack = digits[::-1]
-            
-            real_rgb = measured_colors[i]
-            dist = np.linalg.norm(real_rgb - base_blue)
-            
-            # Filter out anomalies: close to blue but doesn't contain blue
-            if dist < 60 and 3 not in stack:
-                dropped += 1
-                continue
-            
-            valid_rgb.append(real_rgb)
-            valid_stacks.append(stack)
         
-        self.lut_rgb = np.array(valid_rgb)
-        self.ref_stacks = np.array(valid_stacks)
-        self.kdtree = KDTree(self.lut_rgb)
+        # Rebuild all 4-base stacks (0..1023) at once, most significant first
+        idx = np.arange(1024)[:, None]
+        stacks = (idx // (4 ** np.arange(4, -1, -1))) % 4
+        measured_colors = measured_colors[:1024]
+        
+        # Filter outliers: close to blue but doesn't contain blue
+        dists = np.linalg.norm(measured_colors - base_blue, axis=1)
+        keep = ~((dists < 60) & (stacks != 3).all(axis=1))
+        dropped = int(np.count_nonzero(~keep))
+        
+        self.lut_rgb = measured_colors[keep]
+        # Material ids are 0-3 (-1 = transparent), so int8 keeps material_matrix 8x smaller
+        self.ref_stacks = np.ascontiguousarray(stacks[keep], dtype=np.int8)
+        
+        self._lut_digest = hashlib.sha1(np.ascontiguousarray(self.lut_rgb).tobytes()).hexdigest()
+        
+        # Precompute terms for the CPU nearest-color search
+        self._lut_f32_t = self.lut_rgb.astype(np.float32).T.copy()
+        self._lut_sq = (self._lut_f32_t ** 2).sum(axis=0)
         
         # Move LUT to GPU if CUDA available
         if TORCH_AVAILABLE and self.use_cuda:
             try:
                 self.lut_rgb_gpu = torch.from_numpy(self.lut_rgb).float().to(self.device)
-                self.ref_stacks_gpu = torch.from_numpy(self.ref_stacks).long().to(self.device)
+                self.ref_stacks_gpu = torch.from_numpy(self.ref_stacks).to(self.device)
+                self.lut_rgb_gpu_i16 = torch.from_numpy(self.lut_rgb).to(self.device).short()
+                self._lut_sq_norm = (self.lut_rgb_gpu ** 2).sum(dim=1)
+                self._lut_rgb_gpu_t = self.lut_rgb_gpu.T.contiguous()
                 print(f"[CUDA] LUT loaded on GPU (filtered {dropped} outliers)")
             except Exception as e:
                 print(f"[CUDA] Failed to load LUT on GPU: {e}")
@@ -152,7 +399,8 @@ class LuminaImageProcessorCUDA:
         print(f"[IMAGE_PROCESSOR] Filter settings: blur_kernel={blur_kernel}, smooth_sigma={smooth_sigma}")
         
         # Load image
-        img = Image.open(image_path).convert('RGBA')
+        img_arr = _read_rgba(image_path)
+        src_h, src_w = img_arr.shape[:2]
         
         # Calculate target resolution
         if use_high_fidelity:
@@ -165,11 +413,11 @@ class LuminaImageProcessorCUDA:
             pixel_to_mm_scale = PrinterConfig.NOZZLE_WIDTH
             print(f"[IMAGE_PROCESSOR] Pixel mode: {1.0/pixel_to_mm_scale:.2f} px/mm")
         
-        target_h = int(target_w * img.height / img.width)
+        target_h = int(target_w * src_h / src_w)
         print(f"[IMAGE_PROCESSOR] Target: {target_w}x{target_h}px ({target_w*pixel_to_mm_scale:.1f}x{target_h*pixel_to_mm_scale:.1f}mm)")
         
-        img = img.resize((target_w, target_h), Image.Resampling.NEAREST)
-        img_arr = np.array(img)
+        # INTER_NEAREST_EXACT samples pixel centers, same as PIL NEAREST
+        img_arr = cv2.resize(img_arr, (target_w, target_h), interpolation=cv2.INTER_NEAREST_EXACT)
         rgb_arr = img_arr[:, :, :3]
         alpha_arr = img_arr[:, :, 3]
         
@@ -191,9 +439,12 @@ class LuminaImageProcessorCUDA:
         # Background removal
         mask_transparent = mask_transparent_initial.copy()
         if auto_bg:
-            bg_color = bg_reference[0, 0]
-            diff = np.sum(np.abs(bg_reference - bg_color), axis=-1)
-            mask_transparent = np.logical_or(mask_transparent, diff < bg_tol)
+            # L1 distance to the corner color; int16 holds the 0-765 range
+            bg = bg_reference.astype(np.int16)
+            bg -= bg[0, 0]
+            np.abs(bg, out=bg)
+            diff = bg.sum(axis=-1, dtype=np.int16)
+            np.logical_or(mask_transparent, diff < bg_tol, out=mask_transparent)
         
         # Apply transparency mask
         material_matrix[mask_transparent] = -1
@@ -227,12 +478,20 @@ class LuminaImageProcessorCUDA:
         # Step 1: Bilateral filter (edge-preserving smoothing)
         if smooth_sigma > 0:
             print(f"[IMAGE_PROCESSOR] Applying bilateral filter (sigma={smooth_sigma})...")
-            rgb_processed = cv2.bilateralFilter(
-                rgb_arr.astype(np.uint8), 
-                d=9,
-                sigmaColor=smooth_sigma, 
-                sigmaSpace=smooth_sigma
-            )
+            rgb_processed = None
+            if self.use_cuda:
+                try:
+                    img_gpu = torch.from_numpy(np.ascontiguousarray(rgb_arr, dtype=np.uint8)).to(self.device)
+                    rgb_processed = _bilateral_torch(img_gpu, d=9, sigma=smooth_sigma).cpu().numpy()
+                except Exception as e:
+                    print(f"[CUDA] GPU bilateral filter failed ({e}), falling back to CPU")
+            if rgb_processed is None:
+                rgb_processed = cv2.bilateralFilter(
+                    rgb_arr.astype(np.uint8), 
+                    d=9,
+                    sigmaColor=smooth_sigma, 
+                    sigmaSpace=smooth_sigma
+                )
         else:
             print(f"[IMAGE_PROCESSOR] Bilateral filter disabled (sigma=0)")
             rgb_processed = rgb_arr.astype(np.uint8)
@@ -253,82 +512,70 @@ class LuminaImageProcessorCUDA:
         h, w = rgb_sharpened.shape[:2]
         pixels = rgb_sharpened.reshape(-1, 3).astype(np.float32)
         
+        gpu_result = None
         if TORCH_AVAILABLE and self.use_cuda and len(pixels) > 10000:
-            # Use PyTorch for large images
+            # Use PyTorch for large images; labels/centroids stay on the GPU
+            # through LUT matching and are copied back once
             try:
-                quantized_image, centers = self._kmeans_torch(pixels, quantize_colors, h, w)
+                labels_gpu, centroids_gpu = self._kmeans_torch(pixels, quantize_colors)
                 print(f"[IMAGE_PROCESSOR] PyTorch K-Means complete!")
+                gpu_result = self._finalize_gpu(labels_gpu, centroids_gpu, h, w)
+                print(f"[IMAGE_PROCESSOR] PyTorch color matching complete!")
             except Exception as e:
                 print(f"[CUDA] PyTorch K-Means failed: {e}. Falling back to CPU.")
+        
+        if gpu_result is not None:
+            quantized_image, matched_rgb, material_matrix, num_colors = gpu_result
+            print(f"[IMAGE_PROCESSOR] Found {num_colors} unique colors")
+        else:
+            if quantize_colors <= OCTREE_MAX_COLORS and not self.use_cuda:
+                # Small palettes: octree partition, then a few Lloyd passes
+                # from it instead of ten K-Means++ restarts
+                labels, centers = _octree_quantize(rgb_sharpened, quantize_colors)
+                labels, centers = _refine_palette(pixels, labels, centers)
+                print(f"[IMAGE_PROCESSOR] Octree quantization complete!")
+            else:
                 criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
                 flags = cv2.KMEANS_PP_CENTERS
                 _, labels, centers = cv2.kmeans(pixels, quantize_colors, None, criteria, 10, flags)
                 centers = centers.astype(np.uint8)
-                quantized_pixels = centers[labels.flatten()]
-                quantized_image = quantized_pixels.reshape(h, w, 3)
-        else:
-            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
-            flags = cv2.KMEANS_PP_CENTERS
-            _, labels, centers = cv2.kmeans(pixels, quantize_colors, None, criteria, 10, flags)
-            centers = centers.astype(np.uint8)
             quantized_pixels = centers[labels.flatten()]
             quantized_image = quantized_pixels.reshape(h, w, 3)
-        
-        # Find unique colors
-        unique_colors = np.unique(quantized_image.reshape(-1, 3), axis=0)
-        print(f"[IMAGE_PROCESSOR] Found {len(unique_colors)} unique colors")
-        
-        # Match to LUT with CUDA if available
-        print(f"[IMAGE_PROCESSOR] Matching colors to LUT...")
-        if TORCH_AVAILABLE and self.use_cuda and len(unique_colors) > 50:
-            try:
-                unique_indices = self._match_colors_torch(unique_colors)
-                print(f"[IMAGE_PROCESSOR] PyTorch color matching complete!")
-            except Exception as e:
-                print(f"[CUDA] PyTorch color matching failed: {e}. Falling back to CPU.")
-                _, unique_indices = self.kdtree.query(unique_colors.astype(float))
-        else:
-            _, unique_indices = self.kdtree.query(unique_colors.astype(float))
-        
-        # Build color mapping
-        color_to_stack = {}
-        color_to_rgb = {}
-        for i, color in enumerate(unique_colors):
-            color_key = tuple(color)
-            color_to_stack[color_key] = self.ref_stacks[unique_indices[i]]
-            color_to_rgb[color_key] = self.lut_rgb[unique_indices[i]]
-        
-        # Map back to full image - optimized with pre-allocated arrays
-        print(f"[IMAGE_PROCESSOR] Mapping to full image...")
-        matched_rgb = np.zeros((target_h, target_w, 3), dtype=np.uint8)
-        material_matrix = np.zeros((target_h, target_w, PrinterConfig.COLOR_LAYERS), dtype=int)
-        
-        # Convert dictionaries to arrays for faster lookup
-        unique_color_list = list(color_to_rgb.keys())
-        rgb_list = [color_to_rgb[c] for c in unique_color_list]
-        stack_list = [color_to_stack[c] for c in unique_color_list]
-        
-        # Create a color index map
-        color_index_map = {}
-        for i, color in enumerate(unique_color_list):
-            color_index_map[color] = i
-        
-        # Vectorized index assignment
-        flat_quantized = quantized_image.reshape(-1, 3)
-        flat_indices = np.array([color_index_map.get(tuple(c), 0) for c in flat_quantized])
-        
-        matched_rgb_flat = np.array(rgb_list)[flat_indices]
-        material_matrix_flat = np.array(stack_list)[flat_indices]
-        
-        matched_rgb = matched_rgb_flat.reshape(target_h, target_w, 3)
-        material_matrix = material_matrix_flat.reshape(target_h, target_w, PrinterConfig.COLOR_LAYERS)
+            
+            # Find unique colors (inverse maps every pixel to its unique color)
+            unique_colors, inverse = np.unique(
+                quantized_image.reshape(-1, 3), axis=0, return_inverse=True
+            )
+            inverse = inverse.reshape(-1)
+            num_colors = len(unique_colors)
+            print(f"[IMAGE_PROCESSOR] Found {num_colors} unique colors")
+            
+            # Match to LUT with CUDA if available
+            print(f"[IMAGE_PROCESSOR] Matching colors to LUT...")
+            if TORCH_AVAILABLE and self.use_cuda and len(unique_colors) > 50:
+                try:
+                    unique_indices = self._match_colors_torch(unique_colors)
+                    print(f"[IMAGE_PROCESSOR] PyTorch color matching complete!")
+                except Exception as e:
+                    print(f"[CUDA] PyTorch color matching failed: {e}. Falling back to CPU.")
+                    unique_indices = self._match_cpu(unique_colors)
+            else:
+                unique_indices = self._match_cpu(unique_colors)
+            
+            # Map back to full image
+            print(f"[IMAGE_PROCESSOR] Mapping to full image...")
+            pixel_indices = unique_indices[inverse]
+            matched_rgb = self.lut_rgb[pixel_indices].reshape(target_h, target_w, 3)
+            material_matrix = self.ref_stacks[pixel_indices].reshape(
+                target_h, target_w, PrinterConfig.COLOR_LAYERS
+            )
         
         print(f"[IMAGE_PROCESSOR] Color matching complete!")
         
         # Prepare debug data
         debug_data = {
             'quantized_image': quantized_image.copy(),
-            'num_colors': len(unique_colors),
+            'num_colors': num_colors,
             'bilateral_filtered': rgb_processed.copy(),
             'filter_settings': {
                 'blur_kernel': blur_kernel,
@@ -338,13 +585,21 @@ class LuminaImageProcessorCUDA:
         
         return matched_rgb, material_matrix, quantized_image, debug_data
     
-    def _kmeans_torch(self, pixels, k, h, w):
+    def _kmeans_torch(self, pixels, k):
         """
         PyTorch CUDA-accelerated K-Means clustering with minimal CPU-GPU transfers
+        
+        Returns:
+            tuple: (labels, centroids) as GPU tensors of shape (N,) and (k, 3)
         """
         # Transfer data to GPU once
         pixels_torch = torch.from_numpy(pixels).float().to(self.device)
         
+        # Low-precision copy for distance math (FP16 halves bandwidth on GPU);
+        # scaled to 0-1 so squared terms stay well inside the FP16 range
+        dist_dtype = torch.float16 if pixels_torch.is_cuda else torch.float32
+        pixels_unit = (pixels_torch / 255.0).to(dist_dtype)
+        
         # Initialize centroids randomly on GPU
         torch.manual_seed(42)
         indices = torch.randperm(len(pixels), device=self.device)[:k]
@@ -354,22 +609,18 @@ class LuminaImageProcessorCUDA:
         max_iter = 100
         tol = 0.2
         
+        step = _get_kmeans_step()
+        
         for iteration in range(max_iter):
-            # Calculate distances and assign labels - all on GPU
-            distances = torch.cdist(pixels_torch, centroids)
-            labels = torch.argmin(distances, dim=1)
-            
-            # Update centroids on GPU
-            new_centroids = torch.zeros_like(centroids)
-            for i in range(k):
-                mask = labels == i
-                if mask.any():
-                    new_centroids[i] = pixels_torch[mask].mean(dim=0)
-                else:
-                    new_centroids[i] = centroids[i]
-            
-            # Check convergence on GPU
-            shift = torch.norm(new_centroids - centroids)
+            # Assign labels and update centroids - all on GPU
+            try:
+                labels, new_centroids, shift = step(pixels_torch, pixels_unit, centroids)
+            except Exception as e:
+                if step is _kmeans_step:
+                    raise
+                print(f"[CUDA] torch.compile unavailable ({e}), using eager K-Means step")
+                step = _disable_compiled_kmeans_step()
+                labels, new_centroids, shift = step(pixels_torch, pixels_unit, centroids)
             centroids = new_centroids
             
             # Only sync to CPU for convergence check
@@ -377,76 +628,199 @@ class LuminaImageProcessorCUDA:
                 print(f"[CUDA] K-Means converged at iteration {iteration + 1}")
                 break
         
-        # Transfer only final results back to CPU
-        labels_cpu = labels.cpu().numpy()
-        centroids_cpu = centroids.cpu().numpy().astype(np.uint8)
+        return labels, centroids
+    
+    def _finalize_gpu(self, labels_gpu, centroids_gpu, h, w):
+        """
+        Match K-Means output to the LUT on the GPU and copy results back once
+        
+        Only the used centroids are deduplicated and matched; every pixel then
+        gathers its LUT entry through its cluster label.
         
-        # Build quantized image on CPU
-        quantized_pixels = centroids_cpu[labels_cpu]
-        quantized_image = quantized_pixels.reshape(h, w, 3)
+        Returns:
+            tuple: (quantized_image, matched_rgb, material_matrix, num_colors)
+        """
+        k = centroids_gpu.shape[0]
+        centroids_u8 = centroids_gpu.to(torch.uint8)
+        
+        # Unique colors among the clusters that actually own pixels
+        used = torch.bincount(labels_gpu, minlength=k) > 0
+        used_ids = torch.nonzero(used).squeeze(1)
+        unique_colors, used_to_unique = torch.unique(
+            centroids_u8[used_ids], dim=0, return_inverse=True
+        )
+        
+        # Nearest LUT entry per unique color, then per cluster label
+        unique_indices = self._nearest_lut_gpu(unique_colors)
+        label_to_lut = torch.zeros(k, dtype=torch.long, device=self.device)
+        label_to_lut[used_ids] = unique_indices[used_to_unique]
+        pixel_indices = label_to_lut[labels_gpu]
+        
+        quantized_image = centroids_u8[labels_gpu].view(h, w, 3)
+        matched_rgb = self.lut_rgb_gpu[pixel_indices].to(torch.uint8).view(h, w, 3)
+        material_matrix = self.ref_stacks_gpu[pixel_indices].view(
+            h, w, PrinterConfig.COLOR_LAYERS
+        )
+        
+        return (
+            quantized_image.cpu().numpy(),
+            matched_rgb.cpu().numpy(),
+            material_matrix.cpu().numpy(),
+            len(unique_colors)
+        )
+    
+    def _nearest_lut_gpu(self, colors_gpu):
+        """
+        Index of the nearest LUT color for each row of an (N, 3) RGB GPU tensor
         
-        return quantized_image, centroids_cpu
+        RGB is integer 0-255, so squared distances are computed exactly in
+        integer math (int16 differences widened to int32) instead of FP32.
+        """
+        diff = (colors_gpu.short()[:, None, :] - self.lut_rgb_gpu_i16[None, :, :]).int()
+        distances = (diff * diff).sum(dim=2)
+        return torch.argmin(distances, dim=1)
     
     def _match_colors_torch(self, unique_colors):
         """
         PyTorch CUDA-accelerated color matching with minimal CPU-GPU transfers
         """
         # Transfer unique colors to GPU once
-        unique_colors_torch = torch.from_numpy(unique_colors.astype(float)).float().to(self.device)
-        
-        # Use pre-loaded LUT on GPU
-        lut_rgb_torch = self.lut_rgb_gpu
+        unique_colors_torch = torch.from_numpy(unique_colors.astype(np.int16)).to(self.device)
         
-        # Calculate all pairwise distances on GPU
-        distances = torch.cdist(unique_colors_torch, lut_rgb_torch)
-        
-        # Find nearest neighbors on GPU
-        indices = torch.argmin(distances, dim=1)
+        # Find nearest neighbors on GPU against the pre-loaded LUT
+        indices = self._nearest_lut_gpu(unique_colors_torch)
         
         # Transfer only final indices back to CPU
         return indices.cpu().numpy()
     
+    def _match_cpu(self, pixels):
+        """
+        Find the nearest LUT color for each pixel with a blocked brute-force search
+        
+        With at most ~1000 LUT entries in 3D a flat distance scan beats KD-Tree
+        traversal. Uses |l|^2 - 2*p.l (the |p|^2 term does not change the argmin).
+        """
+        pixels = np.asarray(pixels, dtype=np.float32).reshape(-1, 3)
+        indices = np.empty(len(pixels), dtype=np.intp)
+        
+        for i in range(0, len(pixels), CPU_MATCH_CHUNK):
+            block = pixels[i:i + CPU_MATCH_CHUNK]
+            d2 = block @ self._lut_f32_t
+            d2 *= -2
+            d2 += self._lut_sq
+            indices[i:i + CPU_MATCH_CHUNK] = d2.argmin(axis=1)
+        
+        return indices
+    
+    def _pixel_nn_table(self):
+        """
+        Return the (1<<24,) nearest-index table for this LUT, creating it on first use
+        
+        Entries are int16 (32 MB per table), which holds LUT indices up to 32767;
+        _load_lut caps LUTs at 1024 colors. A LUT with more than 32767 entries
+        would overflow int16, so it gets an int32 table instead.
+        """
+        table = _PIXEL_NN_TABLES.get(self._lut_digest)
+        if table is None:
+            if len(_PIXEL_NN_TABLES) >= _PIXEL_NN_MAX_TABLES:
+                _PIXEL_NN_TABLES.clear()
+            index_dtype = np.int16 if len(self.lut_rgb) <= np.iinfo(np.int16).max else np.int32
+            table = np.full(1 << 24, -1, dtype=index_dtype)
+            _PIXEL_NN_TABLES[self._lut_digest] = table
+        return table
+    
+    def _match_pixels_cuda(self, flat_rgb):
+        """
+        Nearest LUT index for every (N, 3) uint8 color, in batches on the GPU
+        """
+        total_pixels = len(flat_rgb)
+        
+        # Batches are bounded so the (batch, LUT) score matrix stays small
+        batch_size = min(GPU_MATCH_CHUNK, total_pixels)
+        
+        # Pre-allocate result tensor on GPU
+        all_indices = torch.empty(total_pixels, dtype=torch.long, device=self.device)
+        
+        # Upload raw uint8 from pinned memory on a side stream so the
+        # copy of batch i+1 overlaps the distance computation of batch i
+        host_rgb = torch.from_numpy(np.ascontiguousarray(flat_rgb, dtype=np.uint8)).pin_memory()
+        copy_stream = torch.cuda.Stream(device=self.device)
+        compute_stream = torch.cuda.current_stream(self.device)
+        
+        def upload(start):
+            with torch.cuda.stream(copy_stream):
+                batch_u8 = host_rgb[start:start + batch_size].to(self.device, non_blocking=True)
+                ready = torch.cuda.Event()
+                ready.record(copy_stream)
+            return batch_u8, ready
+        
+        batch_starts = list(range(0, total_pixels, batch_size))
+        pending = upload(batch_starts[0])
+        
+        # Process batches
+        for n, i in enumerate(batch_starts):
+            end_idx = min(i + batch_size, total_pixels)
+            batch_u8, ready = pending
+            if n + 1 < len(batch_starts):
+                pending = upload(batch_starts[n + 1])
+            
+            compute_stream.wait_event(ready)
+            batch_u8.record_stream(compute_stream)
+            batch = batch_u8.float()
+            
+            # Nearest neighbors via one GEMM: |l|^2 - 2*p.l has the same
+            # argmin as the Euclidean distance (|p|^2 is constant per row)
+            scores = torch.addmm(self._lut_sq_norm, batch, self._lut_rgb_gpu_t, alpha=-2)
+            all_indices[i:end_idx] = torch.argmin(scores, dim=1)
+            
+            # Free batch memory immediately
+            del batch, batch_u8, scores
+        
+        # Transfer all results back to CPU at once (synchronizes the streams)
+        return all_indices.cpu().numpy()
+    
     def _process_pixel_mode_cuda(self, rgb_arr, target_h, target_w):
         """
         CUDA-accelerated pixel art mode image processing with optimized memory usage
+        
+        Matches go through a per-LUT table indexed by packed 24-bit RGB that is
+        filled lazily: only colors never seen before with this LUT are matched,
+        every other pixel is a single table lookup.
         """
         print(f"[IMAGE_PROCESSOR] Direct pixel-level matching (Pixel Art mode)...")
         
         flat_rgb = rgb_arr.reshape(-1, 3)
-        total_pixels = len(flat_rgb)
+        keys = (
+            (flat_rgb[:, 0].astype(np.uint32) << 16)
+            | (flat_rgb[:, 1].astype(np.uint32) << 8)
+            | flat_rgb[:, 2]
+        )
         
-        if TORCH_AVAILABLE and self.use_cuda and total_pixels > 10000:
-            try:
-                print(f"[IMAGE_PROCESSOR] Using PyTorch CUDA for color matching...")
-                
-                # Process in larger batches to reduce overhead
-                # Adjust batch size based on available GPU memory
-                batch_size = min(500000, total_pixels)  # Increased batch size
-                indices_list = []
-                
-                # Pre-allocate result tensor on GPU
-                all_indices = torch.empty(total_pixels, dtype=torch.long, device=self.device)
-                
-                # Process batches
-                for i in range(0, total_pixels, batch_size):
-                    end_idx = min(i + batch_size, total_pixels)
-                    batch = torch.from_numpy(flat_rgb[i:end_idx].astype(float)).float().to(self.device)
-                    
-                    # Calculate distances and find nearest neighbors
-                    distances = torch.cdist(batch, self.lut_rgb_gpu)
-                    all_indices[i:end_idx] = torch.argmin(distances, dim=1)
-                    
-                    # Free batch memory immediately
-                    del batch, distances
-                
-                # Transfer all results back to CPU at once
-                indices_cpu = all_indices.cpu().numpy()
-                print(f"[IMAGE_PROCESSOR] PyTorch CUDA color matching complete!")
-            except Exception as e:
-                print(f"[CUDA] PyTorch matching failed: {e}. Falling back to CPU.")
-                _, indices_cpu = self.kdtree.query(flat_rgb)
-        else:
-            _, indices_cpu = self.kdtree.query(flat_rgb)
+        table = self._pixel_nn_table()
+        indices_cpu = table[keys]
+        miss = indices_cpu < 0
+        
+        if miss.any():
+            new_keys = np.unique(keys[miss])
+            new_rgb = np.stack(
+                [(new_keys >> 16) & 255, (new_keys >> 8) & 255, new_keys & 255], axis=1
+            ).astype(np.uint8)
+            print(f"[IMAGE_PROCESSOR] Matching {len(new_keys)} new colors "
+                  f"({len(keys) - np.count_nonzero(miss)} cached pixels)")
+            
+            if TORCH_AVAILABLE and self.use_cuda and len(new_rgb) > 10000:
+                try:
+                    print(f"[IMAGE_PROCESSOR] Using PyTorch CUDA for color matching...")
+                    new_indices = self._match_pixels_cuda(new_rgb)
+                    print(f"[IMAGE_PROCESSOR] PyTorch CUDA color matching complete!")
+                except Exception as e:
+                    print(f"[CUDA] PyTorch matching failed: {e}. Falling back to CPU.")
+                    new_indices = self._match_cpu(new_rgb)
+            else:
+                new_indices = self._match_cpu(new_rgb)
+            
+            table[new_keys] = new_indices
+            indices_cpu = table[keys]
         
         matched_rgb = self.lut_rgb[indices_cpu].reshape(target_h, target_w, 3)
         material_matrix = self.ref_stacks[indices_cpu].reshape(
@@ -87,8 +87,8 @@ if __name__ == "__main__":
 
     try:
         from ui.layout_new import HEADER_CSS
-        # Import crop extension for head JS injection
-        from ui.crop_extension import get_crop_head_js
+        # Import crop extension for head JS and CSS injection
+        from ui.crop_extension import CROP_MODAL_CSS, CROP_MODAL_JS
         app.launch(
             inbrowser=False,
             server_name="0.0.0.0",
@@ -96,9 +96,9 @@ if __name__ == "__main__":
             show_error=True,
             prevent_thread_lock=True,
             favicon_path="icon.ico" if os.path.exists("icon.ico") else None,
-            css=CUSTOM_CSS + HEADER_CSS,
+            css=CUSTOM_CSS + HEADER_CSS + CROP_MODAL_CSS,
             theme=gr.themes.Soft(),
-            head=get_crop_head_js()
+            head=CROP_MODAL_JS
         )
     except Exception as e:
         raise
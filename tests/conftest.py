@@ -0,0 +1,22 @@
+"""
+Lumina Studio - pytest configuration
+
+The property tests are independent of each other, so the suite can be
+spread over all cores with pytest-xdist:
+
+    pip install pytest-xdist
+    pytest -n auto tests/
+
+Hypothesis tags every @given test with the "hypothesis" marker, so CI can
+route them to a parallel job with `-m hypothesis`. Module-level test state
+(mock result, patched processor fixture, RNG) is created per worker.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# core.converter and the ui package import each other; importing the ui
+# package first lets every worker (and plain `pytest`) import core.converter
+import ui  # noqa: F401
@@ -0,0 +1,193 @@
+"""
+Tests for the color replacement callbacks in ui.callbacks
+
+Covers the render memo in front of update_preview_with_replacements and
+the diff-based undo history of the replacement map.
+"""
+
+import numpy as np
+import pytest
+
+from core.converter import update_preview_with_replacements
+from ui import callbacks
+from ui.callbacks import (
+    _render_replacements,
+    _RENDER_CACHE_FIELDS,
+    MAX_HISTORY,
+    on_queue_color_replacement,
+    on_clear_color_replacements,
+    on_undo_color_replacement,
+)
+
+
+LOOP_ARGS = (None, False, 4, 8, 2.5, 0)
+
+
+def _make_cache():
+    """Preview cache with three flat color bands and a transparent corner."""
+    matched_rgb = np.zeros((12, 9, 3), dtype=np.uint8)
+    matched_rgb[:4] = (255, 0, 0)
+    matched_rgb[4:8] = (0, 255, 0)
+    matched_rgb[8:] = (0, 0, 255)
+    mask_solid = np.ones((12, 9), dtype=bool)
+    mask_solid[:2, :2] = False
+
+    preview_rgba = np.empty((12, 9, 4), dtype=np.uint8)
+    preview_rgba[..., :3] = matched_rgb
+    preview_rgba[..., 3] = mask_solid * np.uint8(255)
+    return {
+        'matched_rgb': matched_rgb,
+        'mask_solid': mask_solid,
+        'target_w': 9,
+        'target_h': 12,
+        'preview_rgba': preview_rgba,
+        'color_conf': {'preview': [(255, 0, 0, 255)] * 4},
+    }
+
+
+def _assert_same(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        assert np.array_equal(np.asarray(a), np.asarray(b))
+    else:
+        assert a == b
+
+
+def _assert_matches_uncached(result, cache, replacement_map):
+    display, updated_cache, palette_html = result
+    ref_display, ref_cache, ref_html = update_preview_with_replacements(
+        cache, dict(replacement_map), *LOOP_ARGS
+    )
+    _assert_same(display, ref_display)
+    assert palette_html == ref_html
+    for field in _RENDER_CACHE_FIELDS:
+        _assert_same(updated_cache[field], ref_cache[field])
+
+
+@pytest.fixture
+def empty_render_cache():
+    callbacks._RENDER_CACHE.clear()
+    yield callbacks._RENDER_CACHE
+    callbacks._RENDER_CACHE.clear()
+
+
+def test_render_cache_hit_matches_uncached_render(empty_render_cache):
+    cache = _make_cache()
+    first_map = {'#ff0000': '#ffff00'}
+
+    first = _render_replacements(cache, dict(first_map), *LOOP_ARGS)
+    assert len(empty_render_cache) == 1
+    _assert_matches_uncached(first, cache, first_map)
+
+    # Same map again: served from the memo, same result
+    again = _render_replacements(cache, dict(first_map), *LOOP_ARGS)
+    assert len(empty_render_cache) == 1
+    assert again[0] is first[0]
+    _assert_matches_uncached(again, cache, first_map)
+
+    # Different map: a fresh render, not the cached one
+    second_map = {'#ff0000': '#ffff00', '#0000ff': '#ffffff'}
+    second = _render_replacements(cache, dict(second_map), *LOOP_ARGS)
+    assert len(empty_render_cache) == 2
+    _assert_matches_uncached(second, cache, second_map)
+    assert not np.array_equal(np.asarray(second[0]), np.asarray(first[0]))
+
+
+def test_render_cache_hit_does_not_alias_session_cache(empty_render_cache):
+    cache = _make_cache()
+    replacement_map = {'#00ff00': '#000000'}
+
+    _, first_cache, _ = _render_replacements(cache, dict(replacement_map), *LOOP_ARGS)
+    _, hit_cache, _ = _render_replacements(cache, dict(replacement_map), *LOOP_ARGS)
+
+    assert hit_cache is not first_cache
+    assert hit_cache is not cache
+
+
+# ═══════════════════════════════════════════════════════════════
+# Undo history
+# ═══════════════════════════════════════════════════════════════
+
+def _queue(cache, state, original, replacement):
+    state['map'], state['history'], status = on_queue_color_replacement(
+        cache, original, replacement, state['map'], state['history']
+    )
+    return status
+
+
+def _undo(cache, state):
+    display, _, _, state['map'], state['history'], status = on_undo_color_replacement(
+        cache, state['map'], state['history'], *LOOP_ARGS
+    )
+    return display, status
+
+
+def test_undo_overwrite_restores_previous_value(empty_render_cache):
+    cache = _make_cache()
+    state = {'map': {}, 'history': []}
+
+    _queue(cache, state, '#ff0000', '#ffff00')
+    _queue(cache, state, '#ff0000', '#00ffff')
+    assert state['map'] == {'#ff0000': '#00ffff'}
+
+    display, _ = _undo(cache, state)
+    assert state['map'] == {'#ff0000': '#ffff00'}
+    ref_display, _, _ = update_preview_with_replacements(
+        cache, {'#ff0000': '#ffff00'}, *LOOP_ARGS
+    )
+    assert np.array_equal(np.asarray(display), np.asarray(ref_display))
+
+    _undo(cache, state)
+    assert state['map'] == {}
+    assert state['history'] == []
+
+
+def test_undo_clear_restores_whole_map(empty_render_cache):
+    cache = _make_cache()
+    state = {'map': {}, 'history': []}
+    _queue(cache, state, '#ff0000', '#ffff00')
+    _queue(cache, state, '#0000ff', '#ffffff')
+    before_clear = dict(state['map'])
+
+    _, _, _, state['map'], state['history'], _ = on_clear_color_replacements(
+        cache, state['map'], state['history'], *LOOP_ARGS
+    )
+    assert state['map'] == {}
+
+    _undo(cache, state)
+    assert state['map'] == before_clear
+
+    # The entries recorded before the clear still undo one by one
+    _undo(cache, state)
+    assert state['map'] == {'#ff0000': '#ffff00'}
+
+
+def test_history_is_trimmed_to_max_history(empty_render_cache):
+    cache = _make_cache()
+    state = {'map': {}, 'history': []}
+    extra = 50
+    for i in range(MAX_HISTORY + extra):
+        _queue(cache, state, '#ff0000', f'#{i + 1:06x}')
+    assert len(state['history']) == MAX_HISTORY
+
+    for _ in range(MAX_HISTORY):
+        _undo(cache, state)
+    # Undo stops at the oldest kept diff, not at the empty map
+    assert state['map'] == {'#ff0000': f'#{extra:06x}'}
+
+    _, status = _undo(cache, state)
+    assert 'Nothing to undo' in status
+    assert state['map'] == {'#ff0000': f'#{extra:06x}'}
+
+
+def test_undo_with_empty_history(empty_render_cache):
+    cache = _make_cache()
+    replacement_map = {'#ff0000': '#ffff00'}
+
+    display, out_cache, _, out_map, out_history, status = on_undo_color_replacement(
+        cache, replacement_map, [], *LOOP_ARGS
+    )
+
+    assert 'Nothing to undo' in status
+    assert out_map == {'#ff0000': '#ffff00'}
+    assert out_history == []
+    assert out_cache is cache
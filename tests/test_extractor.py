@@ -0,0 +1,69 @@
+"""
+Tests for the calibration board extractor
+
+_sample_board reads every cell's window mean off a summed-area table; these
+tests pin it to a straightforward per-cell mean over the same windows.
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from config import DST_SIZE
+from core import extractor
+from core.extractor import _sample_board
+
+
+def _per_cell_reference(warped, grid_size, physical_grid, offset_x, offset_y, zoom, barrel):
+    """One cell at a time: distorted sample centre, then the mean of its 8x8 window."""
+    extracted = np.zeros((grid_size, grid_size, 3), dtype=np.uint8)
+    centres = []
+    for r in range(grid_size):
+        for c in range(grid_size):
+            nx = (c + 1 + 0.5) / physical_grid * 2 - 1
+            ny = (r + 1 + 0.5) / physical_grid * 2 - 1
+            k = 1 + barrel * (nx * nx + ny * ny)
+            cx = (nx * k * zoom + 1) / 2 * DST_SIZE + offset_x
+            cy = (ny * k * zoom + 1) / 2 * DST_SIZE + offset_y
+            if 0 <= cx < DST_SIZE and 0 <= cy < DST_SIZE:
+                x0, y0 = int(max(0, cx - 4)), int(max(0, cy - 4))
+                x1, y1 = int(min(DST_SIZE, cx + 4)), int(min(DST_SIZE, cy + 4))
+                extracted[r, c] = warped[y0:y1, x0:x1].mean(axis=(0, 1)).astype(int)
+                centres.append((int(cx), int(cy)))
+    return extracted, centres
+
+
+@pytest.fixture(scope="module")
+def warped_board():
+    """Synthetic warped board: smooth noise, so every window mean differs."""
+    rng = np.random.default_rng(7)
+    noise = rng.integers(0, 256, (DST_SIZE, DST_SIZE, 3), dtype=np.uint8)
+    board = cv2.GaussianBlur(noise, (5, 5), 0)
+    board.flags.writeable = False
+    return board
+
+
+@pytest.mark.parametrize("grid_size, physical_grid", [(32, 34), (36, 38)])
+@pytest.mark.parametrize("offset_x, offset_y, zoom, barrel", [
+    (0, 0, 1.0, 0.0),
+    (7, -5, 1.0, 0.0),
+    (0, 0, 0.915, 0.0),
+    (0, 0, 1.0, -0.13),
+    (-12, 9, 1.085, 0.07),
+    (30, -30, 1.2, 0.2),   # pushes outer cells off the board
+])
+def test_sample_board_matches_per_cell_mean(warped_board, grid_size, physical_grid,
+                                            offset_x, offset_y, zoom, barrel):
+    extractor._SAMPLE_CACHE.clear()
+    vis, extracted = _sample_board(warped_board, grid_size, physical_grid,
+                                   offset_x, offset_y, zoom, barrel)
+
+    ref, centres = _per_cell_reference(warped_board, grid_size, physical_grid,
+                                       offset_x, offset_y, zoom, barrel)
+    assert extracted.shape == (grid_size, grid_size, 3)
+    assert np.array_equal(extracted, ref)
+
+    ref_vis = warped_board.copy()
+    for centre in centres:
+        cv2.drawMarker(ref_vis, centre, (0, 255, 0), cv2.MARKER_CROSS, 8, 1)
+    assert np.array_equal(vis, ref_vis)
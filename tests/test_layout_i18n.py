@@ -0,0 +1,45 @@
+"""
+Tests for the language switch wired up in ui.layout_new.create_app
+
+change_language returns one update per output of the language button; the
+two lists are built separately, so check they still line up both ways.
+"""
+
+import pytest
+
+from ui.layout_new import create_app
+
+
+@pytest.fixture(scope="module")
+def monkeypatch_module():
+    with pytest.MonkeyPatch.context() as mp:
+        yield mp
+
+
+@pytest.fixture(scope="module")
+def language_switch(tmp_path_factory, monkeypatch_module):
+    # create_app writes assets/ and output/ relative to the working directory
+    monkeypatch_module.chdir(tmp_path_factory.mktemp("app"))
+    app = create_app()
+    for block_fn in app.fns.values():
+        if getattr(block_fn.fn, "__name__", "") == "change_language":
+            return block_fn
+    pytest.fail("change_language is not wired to any event")
+
+
+@pytest.mark.parametrize("current_lang, new_lang", [("zh", "en"), ("en", "zh")])
+def test_change_language_updates_every_output(language_switch, current_lang, new_lang):
+    updates = language_switch.fn(current_lang)
+
+    assert len(updates) == len(language_switch.outputs)
+    # The last output is the language state itself
+    assert updates[-1] == new_lang
+    assert all(isinstance(u, dict) for u in updates[:-1])
+
+
+def test_language_round_trip(language_switch):
+    to_en = language_switch.fn("zh")
+    back = language_switch.fn(to_en[-1])
+
+    assert back[-1] == "zh"
+    assert len(back) == len(to_en)
@@ -0,0 +1,47 @@
+"""
+Tests for the cached LUT color list in core.converter
+
+The list is cached per (path, mtime); a file that fails to load must not
+leave an empty entry behind for that key.
+"""
+
+import os
+
+import numpy as np
+
+from core.converter import _load_lut_colors, extract_lut_available_colors
+
+
+def test_lut_colors_sorted_and_unique(tmp_path):
+    lut_path = str(tmp_path / "lut.npy")
+    np.save(lut_path, np.array([[255, 255, 255], [0, 0, 0], [0, 0, 0], [10, 20, 30]],
+                               dtype=np.uint8))
+    _load_lut_colors.cache_clear()
+
+    colors = extract_lut_available_colors(lut_path)
+
+    assert [c['hex'] for c in colors] == ['#000000', '#0a141e', '#ffffff']
+    assert colors[1]['color'] == (10, 20, 30)
+
+
+def test_failed_load_is_not_cached(tmp_path):
+    lut_path = str(tmp_path / "lut.npy")
+    with open(lut_path, "wb") as f:
+        f.write(b"not a numpy file")
+    mtime = os.path.getmtime(lut_path)
+    _load_lut_colors.cache_clear()
+
+    assert extract_lut_available_colors(lut_path) == []
+    assert _load_lut_colors.cache_info().currsize == 0
+
+    # Same path and mtime, now readable: the retry must load it
+    np.save(lut_path, np.array([[1, 2, 3], [4, 5, 6]], dtype=np.uint8))
+    os.utime(lut_path, (mtime, mtime))
+
+    colors = extract_lut_available_colors(lut_path)
+    assert [c['color'] for c in colors] == [(1, 2, 3), (4, 5, 6)]
+
+
+def test_missing_lut_returns_empty(tmp_path):
+    assert extract_lut_available_colors(str(tmp_path / "missing.npy")) == []
+    assert extract_lut_available_colors("") == []
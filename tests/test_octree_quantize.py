@@ -0,0 +1,62 @@
+"""
+Tests for the CPU octree palette quantizer
+
+The octree path replaces K-Means for small palettes on CPU, so it must
+return exactly the requested number of colors and, after refinement, an
+error close to a full K-Means++ run.
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from core.image_processing_cuda import _octree_quantize, _refine_palette
+
+
+def _blurred_noise(seed, side=200):
+    """Smooth random image: many distinct colors, no obvious clusters."""
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (side, side, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (7, 7), 0)
+
+
+def _mse(pixels, labels, palette):
+    diff = palette[np.asarray(labels).reshape(-1)].astype(np.float32) - pixels
+    return float((diff ** 2).mean())
+
+
+@pytest.mark.parametrize("k", [2, 16, 32, 64])
+def test_octree_palette_has_exactly_k_colors(k):
+    img = _blurred_noise(k)
+    labels, palette = _octree_quantize(img, k)
+
+    assert len(palette) == k
+    assert labels.shape == (img.shape[0] * img.shape[1],)
+    assert np.array_equal(np.unique(labels), np.arange(k))
+
+
+def test_octree_keeps_all_colors_when_fewer_than_k():
+    img = np.zeros((10, 10, 3), dtype=np.uint8)
+    img[:5] = (255, 0, 0)
+
+    labels, palette = _octree_quantize(img, 8)
+
+    assert len(palette) == 2
+    assert {tuple(c) for c in palette} == {(0, 0, 0), (255, 0, 0)}
+
+
+@pytest.mark.parametrize("k", [16, 32, 64])
+def test_refined_octree_error_close_to_kmeans(k):
+    img = _blurred_noise(100 + k)
+    pixels = img.reshape(-1, 3).astype(np.float32)
+
+    labels, palette = _refine_palette(pixels, *_octree_quantize(img, k))
+    assert len(palette) == k
+
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
+    _, km_labels, km_centers = cv2.kmeans(
+        pixels, k, None, criteria, 10, cv2.KMEANS_PP_CENTERS
+    )
+    kmeans_mse = _mse(pixels, km_labels, km_centers.astype(np.uint8))
+
+    assert _mse(pixels, labels, palette) <= 1.15 * kmeans_mse
@@ -0,0 +1,60 @@
+"""
+Tests for the pixel-mode nearest-color table in core.image_processing_cuda
+
+Pixel-mode matching fills a per-LUT table lazily; a cold call (every color
+new) and a warm call (every color cached) must both agree with _match_cpu.
+"""
+
+import numpy as np
+import pytest
+
+from core import image_processing_cuda
+from core.image_processing_cuda import LuminaImageProcessorCUDA
+
+
+@pytest.fixture
+def processor(tmp_path):
+    rng = np.random.default_rng(3)
+    lut_path = str(tmp_path / "lut.npy")
+    np.save(lut_path, rng.integers(0, 256, (32, 32, 3), dtype=np.uint8))
+    image_processing_cuda._PIXEL_NN_TABLES.clear()
+    yield LuminaImageProcessorCUDA(lut_path, "CMYW")
+    image_processing_cuda._PIXEL_NN_TABLES.clear()
+
+
+def _expected(processor, rgb_arr):
+    indices = processor._match_cpu(rgb_arr.reshape(-1, 3))
+    h, w = rgb_arr.shape[:2]
+    return processor.lut_rgb[indices].reshape(h, w, 3), processor.ref_stacks[indices].reshape(h, w, -1)
+
+
+def test_pixel_mode_cold_and_warm_match_cpu(processor):
+    rng = np.random.default_rng(11)
+    rgb_arr = rng.integers(0, 256, (40, 30, 3), dtype=np.uint8)
+    rgb_arr[:10] = rgb_arr[10:20]   # repeated colors within one call
+    ref_rgb, ref_material = _expected(processor, rgb_arr)
+
+    cold_rgb, cold_material, _ = processor._process_pixel_mode_cuda(rgb_arr, 40, 30)
+    table = processor._pixel_nn_table()
+    assert table.dtype == np.int16
+    assert np.count_nonzero(table >= 0) == len(np.unique(rgb_arr.reshape(-1, 3), axis=0))
+
+    warm_rgb, warm_material, _ = processor._process_pixel_mode_cuda(rgb_arr, 40, 30)
+
+    for matched, material in ((cold_rgb, cold_material), (warm_rgb, warm_material)):
+        assert np.array_equal(matched, ref_rgb)
+        assert np.array_equal(material, ref_material)
+
+
+def test_pixel_mode_partially_warm_table(processor):
+    rng = np.random.default_rng(12)
+    first = rng.integers(0, 256, (16, 16, 3), dtype=np.uint8)
+    second = rng.integers(0, 256, (16, 16, 3), dtype=np.uint8)
+    second[:8] = first[:8]          # half already in the table
+
+    processor._process_pixel_mode_cuda(first, 16, 16)
+    matched, material, _ = processor._process_pixel_mode_cuda(second, 16, 16)
+
+    ref_rgb, ref_material = _expected(processor, second)
+    assert np.array_equal(matched, ref_rgb)
+    assert np.array_equal(material, ref_material)
@@ -5,19 +5,90 @@ Tests the correctness properties defined in the design document.
 Uses hypothesis library for property-based testing.
 """
 
+import os
+import re
+
 import pytest
 import numpy as np
 from hypothesis import given, strategies as st, settings, assume
+from hypothesis.extra import numpy as hnp
 from unittest.mock import Mock, patch, MagicMock
 
+from core.converter import (
+    generate_preview_cached,
+    extract_color_palette,
+    update_preview_with_replacements,
+)
+from core import color_replacement
+from core.color_replacement import ColorReplacementManager
+
+
+# Hypothesis profiles: "dev" (default) runs each test's full example budget,
+# "ci" a quarter of it. Select with HYPOTHESIS_PROFILE=ci.
+settings.register_profile("dev", max_examples=100, deadline=None)
+settings.register_profile("ci", max_examples=25, deadline=None)
+settings.load_profile(os.getenv("HYPOTHESIS_PROFILE", "dev"))
+
+
+def examples(n):
+    """Scale an example budget written for the dev profile to the active profile."""
+    return max(1, n * settings.default.max_examples // 100)
+
+
+# Lowercase #rrggbb, as emitted by extract_color_palette
+_HEX_RE = re.compile(r'^#[0-9a-f]{6}$')
+
+
+# Shared PCG64 generator for test data (faster than the legacy global
+# Mersenne-Twister state, and reproducible)
+RNG = np.random.default_rng(1234)
+
+
+def pack_rgb(rgb):
+    """Pack (..., 3) RGB values into (...) uint32 keys R | G<<8 | B<<16."""
+    rgb = np.asarray(rgb, dtype=np.uint32)
+    return rgb[..., 0] | (rgb[..., 1] << 8) | (rgb[..., 2] << 16)
+
+
+# Processor output returned by the patched LuminaImageProcessor. Its arrays
+# are shared by every example and made read-only, so an accidental in-place
+# write fails loudly; tests that need to mutate one must np.copy it first.
+_MOCK_RESULT = {
+    'matched_rgb': np.zeros((100, 100, 3), dtype=np.uint8),
+    'material_matrix': np.zeros((100, 100, 4), dtype=np.int32),
+    'mask_solid': np.ones((100, 100), dtype=bool),
+    'dimensions': (100, 100),
+    'pixel_scale': 0.1,
+    'mode_info': {'name': 'test', 'use_high_fidelity': False}
+}
+for _value in _MOCK_RESULT.values():
+    if isinstance(_value, np.ndarray):
+        _value.setflags(write=False)
+
+
+@pytest.fixture(scope="module")
+def patched_processor():
+    """Patch core.converter.LuminaImageProcessor once for the module and yield the mock instance."""
+    with patch('core.converter.LuminaImageProcessor') as MockProcessor:
+        mock_instance = MagicMock()
+        MockProcessor.return_value = mock_instance
+        yield mock_instance
+
+
+def rgb_images(min_side, max_side):
+    """Strategy for (H, W, 3) uint8 images with H and W in [min_side, max_side]."""
+    side = st.integers(min_value=min_side, max_value=max_side)
+    return hnp.arrays(np.uint8, st.tuples(side, side, st.just(3)),
+                      elements=st.integers(min_value=0, max_value=255))
+
 
 # ═══════════════════════════════════════════════════════════════
 # Property 1: Quantize Colors Parameter Propagation
 # ═══════════════════════════════════════════════════════════════
 
-@settings(max_examples=100, deadline=None)
+@settings(max_examples=examples(100))
 @given(quantize_colors=st.integers(min_value=8, max_value=256))
-def test_property_1_quantize_colors_propagation(quantize_colors):
+def test_property_1_quantize_colors_propagation(patched_processor, quantize_colors):
     """
     Feature: preview-color-enhancement
     Property 1: Quantize Colors Parameter Propagation
@@ -28,49 +99,28 @@ def test_property_1_quantize_colors_propagation(quantize_colors):
     
     **Validates: Requirements 1.1, 1.2, 1.3**
     """
-    from core.converter import generate_preview_cached
-    
-    # Create mock processor
-    mock_result = {
-        'matched_rgb': np.zeros((100, 100, 3), dtype=np.uint8),
-        'material_matrix': np.zeros((100, 100, 4), dtype=np.int32),
-        'mask_solid': np.ones((100, 100), dtype=bool),
-        'dimensions': (100, 100),
-        'pixel_scale': 0.1,
-        'mode_info': {'name': 'test', 'use_high_fidelity': False}
-    }
-    
-    captured_quantize = None
-    
-    def capture_process_image(*args, **kwargs):
-        nonlocal captured_quantize
-        captured_quantize = kwargs.get('quantize_colors')
-        return mock_result
+    patched_processor.process_image.return_value = _MOCK_RESULT
+    
+    # Call generate_preview_cached with test quantize_colors
+    generate_preview_cached(
+        image_path='test.png',
+        lut_path='test.npy',
+        target_width_mm=60,
+        auto_bg=True,
+        bg_tol=40,
+        color_mode='RYBW (Red/Yellow/Blue)',
+        quantize_colors=quantize_colors
+    )
+    captured_quantize = patched_processor.process_image.call_args.kwargs['quantize_colors']
     
-    with patch('core.converter.LuminaImageProcessor') as MockProcessor:
-        mock_instance = MagicMock()
-        mock_instance.process_image.side_effect = capture_process_image
-        MockProcessor.return_value = mock_instance
-        
-        # Call generate_preview_cached with test quantize_colors
-        generate_preview_cached(
-            image_path='test.png',
-            lut_path='test.npy',
-            target_width_mm=60,
-            auto_bg=True,
-            bg_tol=40,
-            color_mode='RYBW (Red/Yellow/Blue)',
-            quantize_colors=quantize_colors
-        )
-        
-        # Verify the exact value was passed
-        assert captured_quantize == quantize_colors, \
-            f"Expected quantize_colors={quantize_colors}, got {captured_quantize}"
-
-
-@settings(max_examples=50, deadline=None)
+    # Verify the exact value was passed
+    assert captured_quantize == quantize_colors, \
+        f"Expected quantize_colors={quantize_colors}, got {captured_quantize}"
+
+
+@settings(max_examples=examples(50))
 @given(quantize_colors=st.integers(min_value=-100, max_value=500))
-def test_property_1_quantize_colors_clamping(quantize_colors):
+def test_property_1_quantize_colors_clamping(patched_processor, quantize_colors):
     """
     Feature: preview-color-enhancement
     Property 1 Extension: Quantize Colors Clamping
@@ -80,50 +130,30 @@ def test_property_1_quantize_colors_clamping(quantize_colors):
     
     **Validates: Requirements 1.1, 1.2**
     """
-    from core.converter import generate_preview_cached
+    patched_processor.process_image.return_value = _MOCK_RESULT
     
-    mock_result = {
-        'matched_rgb': np.zeros((100, 100, 3), dtype=np.uint8),
-        'material_matrix': np.zeros((100, 100, 4), dtype=np.int32),
-        'mask_solid': np.ones((100, 100), dtype=bool),
-        'dimensions': (100, 100),
-        'pixel_scale': 0.1,
-        'mode_info': {'name': 'test', 'use_high_fidelity': False}
-    }
-    
-    captured_quantize = None
-    
-    def capture_process_image(*args, **kwargs):
-        nonlocal captured_quantize
-        captured_quantize = kwargs.get('quantize_colors')
-        return mock_result
+    generate_preview_cached(
+        image_path='test.png',
+        lut_path='test.npy',
+        target_width_mm=60,
+        auto_bg=True,
+        bg_tol=40,
+        color_mode='RYBW (Red/Yellow/Blue)',
+        quantize_colors=quantize_colors
+    )
+    captured_quantize = patched_processor.process_image.call_args.kwargs['quantize_colors']
     
-    with patch('core.converter.LuminaImageProcessor') as MockProcessor:
-        mock_instance = MagicMock()
-        mock_instance.process_image.side_effect = capture_process_image
-        MockProcessor.return_value = mock_instance
-        
-        generate_preview_cached(
-            image_path='test.png',
-            lut_path='test.npy',
-            target_width_mm=60,
-            auto_bg=True,
-            bg_tol=40,
-            color_mode='RYBW (Red/Yellow/Blue)',
-            quantize_colors=quantize_colors
-        )
-        
-        # Verify clamping
-        expected = max(8, min(256, quantize_colors))
-        assert captured_quantize == expected, \
-            f"Expected clamped value {expected}, got {captured_quantize}"
+    # Verify clamping
+    expected = max(8, min(256, quantize_colors))
+    assert captured_quantize == expected, \
+        f"Expected clamped value {expected}, got {captured_quantize}"
 
 
 # ═══════════════════════════════════════════════════════════════
 # Property 2: Color Count Bounded by Quantize Colors
 # ═══════════════════════════════════════════════════════════════
 
-@settings(max_examples=20, deadline=None)
+@settings(max_examples=examples(20))
 @given(
     quantize_colors=st.integers(min_value=8, max_value=64),
     image_size=st.tuples(
@@ -148,14 +178,14 @@ def test_property_2_color_count_bounded(quantize_colors, image_size):
     
     # Generate random matched_rgb with limited colors
     num_colors = min(quantize_colors, h * w)
-    palette = np.random.randint(0, 256, size=(num_colors, 3), dtype=np.uint8)
+    palette = RNG.integers(0, 256, size=(num_colors, 3), dtype=np.uint8)
     
     # Assign random colors from palette to each pixel
-    indices = np.random.randint(0, num_colors, size=(h, w))
+    indices = RNG.integers(0, num_colors, size=(h, w))
     matched_rgb = palette[indices]
     
     # Count unique colors
-    unique_colors = np.unique(matched_rgb.reshape(-1, 3), axis=0)
+    unique_colors = np.unique(pack_rgb(matched_rgb))
     
     assert len(unique_colors) <= quantize_colors, \
         f"Expected at most {quantize_colors} colors, got {len(unique_colors)}"
@@ -165,9 +195,9 @@ def test_property_2_color_count_bounded(quantize_colors, image_size):
 # Test Cache Structure
 # ═══════════════════════════════════════════════════════════════
 
-@settings(max_examples=50, deadline=None)
+@settings(max_examples=examples(50))
 @given(quantize_colors=st.integers(min_value=8, max_value=256))
-def test_cache_contains_quantize_colors(quantize_colors):
+def test_cache_contains_quantize_colors(patched_processor, quantize_colors):
     """
     Feature: preview-color-enhancement
     Test: Cache Structure Contains quantize_colors
@@ -176,36 +206,22 @@ def test_cache_contains_quantize_colors(quantize_colors):
     
     **Validates: Requirements 2.5**
     """
-    from core.converter import generate_preview_cached
+    patched_processor.process_image.return_value = _MOCK_RESULT
     
-    mock_result = {
-        'matched_rgb': np.zeros((100, 100, 3), dtype=np.uint8),
-        'material_matrix': np.zeros((100, 100, 4), dtype=np.int32),
-        'mask_solid': np.ones((100, 100), dtype=bool),
-        'dimensions': (100, 100),
-        'pixel_scale': 0.1,
-        'mode_info': {'name': 'test', 'use_high_fidelity': False}
-    }
+    _, cache, _ = generate_preview_cached(
+        image_path='test.png',
+        lut_path='test.npy',
+        target_width_mm=60,
+        auto_bg=True,
+        bg_tol=40,
+        color_mode='RYBW (Red/Yellow/Blue)',
+        quantize_colors=quantize_colors
+    )
     
-    with patch('core.converter.LuminaImageProcessor') as MockProcessor:
-        mock_instance = MagicMock()
-        mock_instance.process_image.return_value = mock_result
-        MockProcessor.return_value = mock_instance
-        
-        _, cache, _ = generate_preview_cached(
-            image_path='test.png',
-            lut_path='test.npy',
-            target_width_mm=60,
-            auto_bg=True,
-            bg_tol=40,
-            color_mode='RYBW (Red/Yellow/Blue)',
-            quantize_colors=quantize_colors
-        )
-        
-        assert cache is not None, "Cache should not be None"
-        assert 'quantize_colors' in cache, "Cache should contain quantize_colors"
-        assert cache['quantize_colors'] == quantize_colors, \
-            f"Cache quantize_colors should be {quantize_colors}, got {cache['quantize_colors']}"
+    assert cache is not None, "Cache should not be None"
+    assert 'quantize_colors' in cache, "Cache should contain quantize_colors"
+    assert cache['quantize_colors'] == quantize_colors, \
+        f"Cache quantize_colors should be {quantize_colors}, got {cache['quantize_colors']}"
 
 
 
@@ -213,6 +229,14 @@ def test_cache_contains_quantize_colors(quantize_colors):
 # Property 5: Color Replacement Map CRUD Consistency
 # ═══════════════════════════════════════════════════════════════
 
+@pytest.fixture(scope="module")
+def replacement_manager():
+    """One ColorReplacementManager shared by the Property 5 tests; each example clear()s it first."""
+    manager = ColorReplacementManager()
+    yield manager
+    manager.clear()
+
+
 # Strategy for generating valid RGB colors
 rgb_color = st.tuples(
     st.integers(min_value=0, max_value=255),
@@ -221,12 +245,20 @@ rgb_color = st.tuples(
 )
 
 
-@settings(max_examples=100, deadline=None)
+@st.composite
+def distinct_rgb_pair(draw):
+    """Draw an (original, replacement) pair of two different RGB colors."""
+    original = draw(rgb_color)
+    replacement = draw(rgb_color.filter(lambda c: c != original))
+    return original, replacement
+
+
+@settings(max_examples=examples(100))
 @given(
     original=rgb_color,
     replacement=rgb_color
 )
-def test_property_5_add_get_consistency(original, replacement):
+def test_property_5_add_get_consistency(replacement_manager, original, replacement):
     """
     Feature: preview-color-enhancement
     Property 5: Color Replacement Map CRUD Consistency (Add/Get)
@@ -235,27 +267,24 @@ def test_property_5_add_get_consistency(original, replacement):
     
     **Validates: Requirements 3.3, 3.4, 3.6**
     """
-    from core.color_replacement import ColorReplacementManager
-    
-    manager = ColorReplacementManager()
-    manager.add_replacement(original, replacement)
+    replacement_manager.clear()
+    replacement_manager.add_replacement(original, replacement)
     
     # If original == replacement, it should not be added
     if original == replacement:
-        assert manager.get_replacement(original) is None, \
+        assert replacement_manager.get_replacement(original) is None, \
             "Same color replacement should not be added"
     else:
-        result = manager.get_replacement(original)
+        result = replacement_manager.get_replacement(original)
         assert result == replacement, \
             f"Expected {replacement}, got {result}"
 
 
-@settings(max_examples=100, deadline=None)
+@settings(max_examples=examples(100))
 @given(
-    original=rgb_color,
-    replacement=rgb_color
+    pair=distinct_rgb_pair()
 )
-def test_property_5_remove_consistency(original, replacement):
+def test_property_5_remove_consistency(replacement_manager, pair):
     """
     Feature: preview-color-enhancement
     Property 5: Color Replacement Map CRUD Consistency (Remove)
@@ -264,25 +293,22 @@ def test_property_5_remove_consistency(original, replacement):
     
     **Validates: Requirements 3.3, 3.4, 3.6**
     """
-    from core.color_replacement import ColorReplacementManager
+    original, replacement = pair
     
-    # Skip if colors are the same (won't be added)
-    assume(original != replacement)
-    
-    manager = ColorReplacementManager()
-    manager.add_replacement(original, replacement)
+    replacement_manager.clear()
+    replacement_manager.add_replacement(original, replacement)
     
     # Verify it was added
-    assert manager.get_replacement(original) == replacement
+    assert replacement_manager.get_replacement(original) == replacement
     
     # Remove and verify
-    result = manager.remove_replacement(original)
+    result = replacement_manager.remove_replacement(original)
     assert result is True, "Remove should return True for existing mapping"
-    assert manager.get_replacement(original) is None, \
+    assert replacement_manager.get_replacement(original) is None, \
         "After remove, get_replacement should return None"
 
 
-@settings(max_examples=50, deadline=None)
+@settings(max_examples=examples(50))
 @given(
     replacements=st.lists(
         st.tuples(rgb_color, rgb_color),
@@ -290,7 +316,7 @@ def test_property_5_remove_consistency(original, replacement):
         max_size=20
     )
 )
-def test_property_5_count_consistency(replacements):
+def test_property_5_count_consistency(replacement_manager, replacements):
     """
     Feature: preview-color-enhancement
     Property 5: Color Replacement Map CRUD Consistency (Count)
@@ -299,9 +325,7 @@ def test_property_5_count_consistency(replacements):
     
     **Validates: Requirements 3.3, 3.4, 3.6**
     """
-    from core.color_replacement import ColorReplacementManager
-    
-    manager = ColorReplacementManager()
+    replacement_manager.clear()
     
     # Track unique originals that should be added
     expected_count = 0
@@ -313,18 +337,17 @@ def test_property_5_count_consistency(replacements):
             if original not in seen_originals:
                 expected_count += 1
             seen_originals.add(original)
-        manager.add_replacement(original, replacement)
+        replacement_manager.add_replacement(original, replacement)
     
-    assert len(manager) == expected_count, \
-        f"Expected {expected_count} entries, got {len(manager)}"
+    assert len(replacement_manager) == expected_count, \
+        f"Expected {expected_count} entries, got {len(replacement_manager)}"
 
 
-@settings(max_examples=50, deadline=None)
+@settings(max_examples=examples(50))
 @given(
-    original=rgb_color,
-    replacement=rgb_color
+    pair=distinct_rgb_pair()
 )
-def test_property_5_serialization_roundtrip(original, replacement):
+def test_property_5_serialization_roundtrip(replacement_manager, pair):
     """
     Feature: preview-color-enhancement
     Property 5 Extension: Serialization Round-Trip
@@ -333,16 +356,13 @@ def test_property_5_serialization_roundtrip(original, replacement):
     
     **Validates: Requirements 3.6**
     """
-    from core.color_replacement import ColorReplacementManager
+    original, replacement = pair
     
-    # Skip if colors are the same
-    assume(original != replacement)
-    
-    manager = ColorReplacementManager()
-    manager.add_replacement(original, replacement)
+    replacement_manager.clear()
+    replacement_manager.add_replacement(original, replacement)
     
     # Serialize and deserialize
-    data = manager.to_dict()
+    data = replacement_manager.to_dict()
     restored = ColorReplacementManager.from_dict(data)
     
     # Verify mapping is preserved
@@ -350,16 +370,12 @@ def test_property_5_serialization_roundtrip(original, replacement):
         "Serialization round-trip should preserve mappings"
 
 
-@settings(max_examples=20, deadline=None)
+@settings(max_examples=examples(20))
 @given(
-    image_size=st.tuples(
-        st.integers(min_value=5, max_value=30),
-        st.integers(min_value=5, max_value=30)
-    ),
-    original=rgb_color,
-    replacement=rgb_color
+    image=rgb_images(5, 30),
+    pair=distinct_rgb_pair()
 )
-def test_property_5_apply_to_image(image_size, original, replacement):
+def test_property_5_apply_to_image(replacement_manager, image, pair):
     """
     Feature: preview-color-enhancement
     Property 5 Extension: Apply to Image
@@ -368,52 +384,115 @@ def test_property_5_apply_to_image(image_size, original, replacement):
     
     **Validates: Requirements 3.3, 3.4**
     """
-    from core.color_replacement import ColorReplacementManager
-    
-    # Skip if colors are the same
-    assume(original != replacement)
+    original, replacement = pair
     
-    h, w = image_size
+    h, w, _ = image.shape
     
-    # Create image with some pixels of original color
-    image = np.random.randint(0, 256, size=(h, w, 3), dtype=np.uint8)
+    # The original color should only appear where it is seeded below
+    assume(not np.any(pack_rgb(image) == pack_rgb(original)))
     
     # Set some pixels to original color
     num_original = max(1, (h * w) // 4)
-    indices = np.random.choice(h * w, size=num_original, replace=False)
-    rows, cols = np.unravel_index(indices, (h, w))
-    image[rows, cols] = original
+    idx = RNG.choice(h * w, size=num_original, replace=False)
+    image.reshape(-1, 3)[idx] = original
     
     # Apply replacement
-    manager = ColorReplacementManager()
-    manager.add_replacement(original, replacement)
-    result = manager.apply_to_image(image)
+    replacement_manager.clear()
+    replacement_manager.add_replacement(original, replacement)
+    result = replacement_manager.apply_to_image(image)
     
     # Verify all original pixels are now replacement
-    original_mask = np.all(image == original, axis=-1)
-    assert np.all(result[original_mask] == replacement), \
+    source_packed = pack_rgb(image)
+    result_packed = pack_rgb(result)
+    original_mask = source_packed == pack_rgb(original)
+    assert np.all(result_packed[original_mask] == pack_rgb(replacement)), \
         "All original color pixels should be replaced"
     
     # Verify other pixels are unchanged
     other_mask = ~original_mask
-    assert np.all(result[other_mask] == image[other_mask]), \
+    assert np.array_equal(result_packed[other_mask], source_packed[other_mask]), \
         "Non-matching pixels should be unchanged"
 
 
 
+# apply_to_image dispatches to the Numba kernel when it is available, else to
+# per-color compares (<= SMALL_MAPPING_COUNT mappings) or packed-key
+# searchsorted. Force each path so all are covered in any environment.
+_NUMBA_PATHS = [
+    pytest.param(True, id="numba", marks=pytest.mark.skipif(
+        not color_replacement.NUMBA_AVAILABLE, reason="numba not installed")),
+    pytest.param(False, id="numpy"),
+]
+
+
+def _reference_apply(image, mapping):
+    """Per-pixel dict lookup: the behaviour every dispatch path must match."""
+    out = image.copy()
+    flat = out.reshape(-1, 3)
+    for i, px in enumerate(image.reshape(-1, 3)):
+        repl = mapping.get(tuple(int(v) for v in px))
+        if repl is not None:
+            flat[i] = repl
+    return out
+
+
+def _palette_image(rng, palette, shape):
+    """Image whose pixels are drawn from palette (an (n, 3) uint8 array)."""
+    return palette[rng.integers(0, len(palette), size=shape)]
+
+
+@pytest.mark.parametrize("use_numba", _NUMBA_PATHS)
+@pytest.mark.parametrize("k", [1, color_replacement.SMALL_MAPPING_COUNT,
+                               color_replacement.SMALL_MAPPING_COUNT + 1, 12])
+@pytest.mark.parametrize("layout", ["contiguous", "strided"])
+def test_apply_to_image_dispatch_paths(monkeypatch, use_numba, k, layout):
+    monkeypatch.setattr(color_replacement, "NUMBA_AVAILABLE", use_numba)
+    rng = np.random.default_rng(k)
+    palette = rng.choice(1 << 24, size=2 * k, replace=False)
+    palette = np.stack([palette & 255, (palette >> 8) & 255, palette >> 16],
+                       axis=1).astype(np.uint8)
+    mapping = {tuple(int(v) for v in palette[i]): tuple(int(v) for v in palette[-1 - i])
+               for i in range(k)}
+
+    image = _palette_image(rng, palette, (24, 40))
+    if layout == "strided":
+        image = image[:, ::2]
+        assert not image.flags.c_contiguous
+
+    manager = ColorReplacementManager()
+    for original, replacement in mapping.items():
+        manager.add_replacement(original, replacement)
+    before = image.copy()
+    result = manager.apply_to_image(image)
+
+    assert np.array_equal(result, _reference_apply(image, mapping))
+    assert np.array_equal(image, before), "input must not be modified"
+
+
+@pytest.mark.parametrize("use_numba", _NUMBA_PATHS)
+@pytest.mark.parametrize("k", [2, 8])
+def test_apply_to_image_without_matching_pixels(monkeypatch, use_numba, k):
+    monkeypatch.setattr(color_replacement, "NUMBA_AVAILABLE", use_numba)
+    image = np.full((16, 16, 3), 7, dtype=np.uint8)
+
+    manager = ColorReplacementManager()
+    for i in range(k):
+        manager.add_replacement((200, i, 0), (0, 0, i))
+    result = manager.apply_to_image(image)
+
+    assert np.array_equal(result, image)
+    assert result is not image
+
+
 # ═══════════════════════════════════════════════════════════════
 # Property 3 & 4: Palette Extraction Tests
 # ═══════════════════════════════════════════════════════════════
 
-@settings(max_examples=50, deadline=None)
+@settings(max_examples=examples(50))
 @given(
-    image_size=st.tuples(
-        st.integers(min_value=5, max_value=50),
-        st.integers(min_value=5, max_value=50)
-    ),
-    num_colors=st.integers(min_value=1, max_value=20)
+    matched_rgb=rgb_images(5, 50)
 )
-def test_property_3_palette_extraction_completeness(image_size, num_colors):
+def test_property_3_palette_extraction_completeness(matched_rgb):
     """
     Feature: preview-color-enhancement
     Property 3: Palette Extraction Completeness
@@ -425,19 +504,10 @@ def test_property_3_palette_extraction_completeness(image_size, num_colors):
     
     **Validates: Requirements 2.1, 2.3**
     """
-    from core.converter import extract_color_palette
-    
-    h, w = image_size
-    
-    # Generate random palette
-    palette_colors = np.random.randint(0, 256, size=(num_colors, 3), dtype=np.uint8)
-    
-    # Create image with random colors from palette
-    indices = np.random.randint(0, num_colors, size=(h, w))
-    matched_rgb = palette_colors[indices]
+    h, w, _ = matched_rgb.shape
     
     # Create random solid mask (at least some pixels solid)
-    mask_solid = np.random.random((h, w)) > 0.3
+    mask_solid = RNG.random((h, w)) > 0.3
     if not np.any(mask_solid):
         mask_solid[0, 0] = True  # Ensure at least one solid pixel
     
@@ -451,29 +521,28 @@ def test_property_3_palette_extraction_completeness(image_size, num_colors):
     palette = extract_color_palette(cache)
     
     # Verify completeness: sum of counts equals total solid pixels
-    total_count = sum(entry['count'] for entry in palette)
+    total_count = int(np.fromiter((entry['count'] for entry in palette),
+                                  dtype=np.int64, count=len(palette)).sum())
     expected_total = np.sum(mask_solid)
     assert total_count == expected_total, \
         f"Sum of palette counts ({total_count}) should equal solid pixels ({expected_total})"
     
     # Verify all unique colors in solid area are in palette
     solid_pixels = matched_rgb[mask_solid]
-    unique_in_image = set(tuple(c) for c in np.unique(solid_pixels, axis=0))
-    palette_colors_set = set(entry['color'] for entry in palette)
+    unique_in_image = np.unique(pack_rgb(solid_pixels))
+    palette_colors = np.sort(pack_rgb(
+        np.array([entry['color'] for entry in palette]).reshape(-1, 3)
+    ))
     
-    assert unique_in_image == palette_colors_set, \
+    assert np.array_equal(unique_in_image, palette_colors), \
         f"Palette should contain exactly the unique colors in solid area"
 
 
-@settings(max_examples=50, deadline=None)
+@settings(max_examples=examples(50))
 @given(
-    image_size=st.tuples(
-        st.integers(min_value=10, max_value=50),
-        st.integers(min_value=10, max_value=50)
-    ),
-    num_colors=st.integers(min_value=2, max_value=15)
+    matched_rgb=rgb_images(10, 50)
 )
-def test_property_4_palette_sorting_invariant(image_size, num_colors):
+def test_property_4_palette_sorting_invariant(matched_rgb):
     """
     Feature: preview-color-enhancement
     Property 4: Palette Sorting Invariant
@@ -483,16 +552,7 @@ def test_property_4_palette_sorting_invariant(image_size, num_colors):
     
     **Validates: Requirements 2.4**
     """
-    from core.converter import extract_color_palette
-    
-    h, w = image_size
-    
-    # Generate random palette
-    palette_colors = np.random.randint(0, 256, size=(num_colors, 3), dtype=np.uint8)
-    
-    # Create image with random colors from palette
-    indices = np.random.randint(0, num_colors, size=(h, w))
-    matched_rgb = palette_colors[indices]
+    h, w, _ = matched_rgb.shape
     
     # All pixels solid for simplicity
     mask_solid = np.ones((h, w), dtype=bool)
@@ -514,14 +574,11 @@ def test_property_4_palette_sorting_invariant(image_size, num_colors):
             f"Palette should be sorted by count descending: {palette[i]['count']} < {palette[i + 1]['count']}"
 
 
-@settings(max_examples=30, deadline=None)
+@settings(max_examples=examples(30))
 @given(
-    image_size=st.tuples(
-        st.integers(min_value=5, max_value=30),
-        st.integers(min_value=5, max_value=30)
-    )
+    matched_rgb=rgb_images(5, 30)
 )
-def test_palette_percentage_sum(image_size):
+def test_palette_percentage_sum(matched_rgb):
     """
     Feature: preview-color-enhancement
     Test: Palette Percentage Sum
@@ -530,12 +587,8 @@ def test_palette_percentage_sum(image_size):
     
     **Validates: Requirements 2.3**
     """
-    from core.converter import extract_color_palette
-    
-    h, w = image_size
+    h, w, _ = matched_rgb.shape
     
-    # Create random image
-    matched_rgb = np.random.randint(0, 256, size=(h, w, 3), dtype=np.uint8)
     mask_solid = np.ones((h, w), dtype=bool)
     
     cache = {
@@ -548,7 +601,8 @@ def test_palette_percentage_sum(image_size):
     if len(palette) == 0:
         return
     
-    total_percentage = sum(entry['percentage'] for entry in palette)
+    total_percentage = float(np.fromiter((entry['percentage'] for entry in palette),
+                                         dtype=np.float64, count=len(palette)).sum())
     
     # Allow floating point rounding error (round() in extract_color_palette causes cumulative error)
     # With many colors, each rounded to 2 decimal places, error can accumulate
@@ -564,8 +618,6 @@ def test_palette_empty_cache():
     
     extract_color_palette should return empty list for None or empty cache.
     """
-    from core.converter import extract_color_palette
-    
     assert extract_color_palette(None) == []
     assert extract_color_palette({}) == []
     assert extract_color_palette({'matched_rgb': None}) == []
@@ -578,9 +630,6 @@ def test_palette_hex_format():
     
     Each palette entry should have a valid hex color string.
     """
-    from core.converter import extract_color_palette
-    import re
-    
     matched_rgb = np.array([[[255, 0, 0], [0, 255, 0]], [[0, 0, 255], [255, 255, 255]]], dtype=np.uint8)
     mask_solid = np.ones((2, 2), dtype=bool)
     
@@ -591,10 +640,8 @@ def test_palette_hex_format():
     
     palette = extract_color_palette(cache)
     
-    hex_pattern = re.compile(r'^#[0-9a-f]{6}$')
-    
     for entry in palette:
-        assert hex_pattern.match(entry['hex']), \
+        assert _HEX_RE.match(entry['hex']), \
             f"Invalid hex format: {entry['hex']}"
 
 
@@ -603,16 +650,28 @@ def test_palette_hex_format():
 # Property 6: Color Replacement Application
 # ═══════════════════════════════════════════════════════════════
 
-@settings(max_examples=30, deadline=None)
+def _build_cache(matched_rgb, mask_solid):
+    """Build the preview cache consumed by update_preview_with_replacements."""
+    h, w, _ = matched_rgb.shape
+    preview_rgba = np.empty((h, w, 4), dtype=np.uint8)
+    preview_rgba[..., :3] = matched_rgb
+    preview_rgba[..., 3] = mask_solid * np.uint8(255)
+    return {
+        'matched_rgb': matched_rgb.copy(),
+        'mask_solid': mask_solid,
+        'target_w': w,
+        'target_h': h,
+        'preview_rgba': preview_rgba,
+        'color_conf': {'preview': [(255, 0, 0, 255)] * 4}
+    }
+
+
+@settings(max_examples=examples(30))
 @given(
-    image_size=st.tuples(
-        st.integers(min_value=10, max_value=50),
-        st.integers(min_value=10, max_value=50)
-    ),
-    original=rgb_color,
-    replacement=rgb_color
+    matched_rgb=rgb_images(10, 50),
+    pair=distinct_rgb_pair()
 )
-def test_property_6_color_replacement_in_preview(image_size, original, replacement):
+def test_property_6_color_replacement_in_preview(matched_rgb, pair):
     """
     Feature: preview-color-enhancement
     Property 6: Color Replacement Application
@@ -623,41 +682,25 @@ def test_property_6_color_replacement_in_preview(image_size, original, replaceme
     
     **Validates: Requirements 4.1, 4.2, 4.3**
     """
-    from core.converter import update_preview_with_replacements, extract_color_palette
-    from core.color_replacement import ColorReplacementManager
+    original, replacement = pair
     
-    # Skip if colors are the same
-    assume(original != replacement)
+    h, w, _ = matched_rgb.shape
     
-    h, w = image_size
-    
-    # Create test image with some pixels of original color
-    matched_rgb = np.random.randint(0, 256, size=(h, w, 3), dtype=np.uint8)
+    # The original color should only appear where it is seeded below
+    assume(not np.any(pack_rgb(matched_rgb) == pack_rgb(original)))
     
     # Set some pixels to original color
     num_original = max(1, (h * w) // 4)
-    indices = np.random.choice(h * w, size=num_original, replace=False)
-    rows, cols = np.unravel_index(indices, (h, w))
-    matched_rgb[rows, cols] = original
+    idx = RNG.choice(h * w, size=num_original, replace=False)
+    matched_rgb.reshape(-1, 3)[idx] = original
     
     mask_solid = np.ones((h, w), dtype=bool)
     
     # Create cache
-    cache = {
-        'matched_rgb': matched_rgb.copy(),
-        'mask_solid': mask_solid,
-        'target_w': w,
-        'target_h': h,
-        'preview_rgba': np.zeros((h, w, 4), dtype=np.uint8),
-        'color_conf': {'preview': [(255, 0, 0, 255)] * 4}
-    }
-    cache['preview_rgba'][mask_solid, :3] = matched_rgb[mask_solid]
-    cache['preview_rgba'][mask_solid, 3] = 255
+    cache = _build_cache(matched_rgb, mask_solid)
     
     # Create replacement map
-    manager = ColorReplacementManager()
-    manager.add_replacement(original, replacement)
-    replacement_dict = manager.to_dict()
+    replacement_dict = {'#%02x%02x%02x' % original: '#%02x%02x%02x' % replacement}
     
     # Apply replacements
     display, updated_cache, palette_html = update_preview_with_replacements(
@@ -668,29 +711,29 @@ def test_property_6_color_replacement_in_preview(image_size, original, replaceme
     new_matched_rgb = updated_cache['matched_rgb']
     
     # Check that original color pixels are now replacement color
-    original_mask = np.all(matched_rgb == original, axis=-1)
-    assert np.all(new_matched_rgb[original_mask] == replacement), \
+    source_packed = pack_rgb(matched_rgb)
+    result_packed = pack_rgb(new_matched_rgb)
+    original_mask = source_packed == pack_rgb(original)
+    assert np.all(result_packed[original_mask] == pack_rgb(replacement)), \
         "All original color pixels should be replaced"
     
     # Check that other pixels are unchanged
     other_mask = ~original_mask
-    assert np.all(new_matched_rgb[other_mask] == matched_rgb[other_mask]), \
+    assert np.array_equal(result_packed[other_mask], source_packed[other_mask]), \
         "Non-matching pixels should be unchanged"
 
 
-@settings(max_examples=20, deadline=None)
+@settings(max_examples=examples(20))
 @given(
-    image_size=st.tuples(
-        st.integers(min_value=10, max_value=30),
-        st.integers(min_value=10, max_value=30)
-    ),
+    matched_rgb=rgb_images(10, 30),
     replacements=st.lists(
         st.tuples(rgb_color, rgb_color),
         min_size=1,
-        max_size=5
+        max_size=5,
+        unique_by=lambda pair: pair[0]  # one mapping per original, as in the manager
     )
 )
-def test_property_6_multiple_replacements(image_size, replacements):
+def test_property_6_multiple_replacements(matched_rgb, replacements):
     """
     Feature: preview-color-enhancement
     Property 6 Extension: Multiple Color Replacements
@@ -699,38 +742,22 @@ def test_property_6_multiple_replacements(image_size, replacements):
     
     **Validates: Requirements 4.1, 4.2**
     """
-    from core.converter import update_preview_with_replacements
-    from core.color_replacement import ColorReplacementManager
-    
-    h, w = image_size
+    h, w, _ = matched_rgb.shape
     
     # Filter out same-color replacements
     valid_replacements = [(o, r) for o, r in replacements if o != r]
     if not valid_replacements:
         return  # Skip if no valid replacements
     
-    # Create test image
-    matched_rgb = np.random.randint(0, 256, size=(h, w, 3), dtype=np.uint8)
-    
     # Set some pixels to each original color
     for i, (original, _) in enumerate(valid_replacements[:3]):  # Limit to 3 for performance
         num_pixels = max(1, (h * w) // 10)
-        indices = np.random.choice(h * w, size=num_pixels, replace=False)
-        rows, cols = np.unravel_index(indices, (h, w))
-        matched_rgb[rows, cols] = original
+        idx = RNG.choice(h * w, size=num_pixels, replace=False)
+        matched_rgb.reshape(-1, 3)[idx] = original
     
     mask_solid = np.ones((h, w), dtype=bool)
     
-    cache = {
-        'matched_rgb': matched_rgb.copy(),
-        'mask_solid': mask_solid,
-        'target_w': w,
-        'target_h': h,
-        'preview_rgba': np.zeros((h, w, 4), dtype=np.uint8),
-        'color_conf': {'preview': [(255, 0, 0, 255)] * 4}
-    }
-    cache['preview_rgba'][mask_solid, :3] = matched_rgb[mask_solid]
-    cache['preview_rgba'][mask_solid, 3] = 255
+    cache = _build_cache(matched_rgb, mask_solid)
     
     # Create replacement map
     manager = ColorReplacementManager()
@@ -746,10 +773,12 @@ def test_property_6_multiple_replacements(image_size, replacements):
     # Verify each replacement was applied
     new_matched_rgb = updated_cache['matched_rgb']
     
+    source_packed = pack_rgb(matched_rgb)
+    result_packed = pack_rgb(new_matched_rgb)
     for original, replacement in valid_replacements:
-        original_mask = np.all(matched_rgb == original, axis=-1)
+        original_mask = source_packed == pack_rgb(original)
         if np.any(original_mask):
-            assert np.all(new_matched_rgb[original_mask] == replacement), \
+            assert np.all(result_packed[original_mask] == pack_rgb(replacement)), \
                 f"Replacement {original} → {replacement} should be applied"
 
 
@@ -757,16 +786,12 @@ def test_property_6_multiple_replacements(image_size, replacements):
 # Property 7: Preview Update Round-Trip
 # ═══════════════════════════════════════════════════════════════
 
-@settings(max_examples=20, deadline=None)
+@settings(max_examples=examples(20))
 @given(
-    image_size=st.tuples(
-        st.integers(min_value=10, max_value=30),
-        st.integers(min_value=10, max_value=30)
-    ),
-    original=rgb_color,
-    replacement=rgb_color
+    matched_rgb=rgb_images(10, 30),
+    pair=distinct_rgb_pair()
 )
-def test_property_7_preview_update_roundtrip(image_size, original, replacement):
+def test_property_7_preview_update_roundtrip(matched_rgb, pair):
     """
     Feature: preview-color-enhancement
     Property 7: Preview Update Round-Trip
@@ -776,48 +801,32 @@ def test_property_7_preview_update_roundtrip(image_size, original, replacement):
     
     **Validates: Requirements 5.1, 5.4**
     """
-    from core.converter import update_preview_with_replacements
-    from core.color_replacement import ColorReplacementManager
-    
-    # Skip if colors are the same
-    assume(original != replacement)
+    original, replacement = pair
     
-    h, w = image_size
+    h, w, _ = matched_rgb.shape
     
-    # Create test image
-    matched_rgb = np.random.randint(0, 256, size=(h, w, 3), dtype=np.uint8)
+    # The original color should only appear where it is seeded below
+    assume(not np.any(pack_rgb(matched_rgb) == pack_rgb(original)))
     
     # Set some pixels to original color
     num_original = max(1, (h * w) // 4)
-    indices = np.random.choice(h * w, size=num_original, replace=False)
-    rows, cols = np.unravel_index(indices, (h, w))
-    matched_rgb[rows, cols] = original
+    idx = RNG.choice(h * w, size=num_original, replace=False)
+    matched_rgb.reshape(-1, 3)[idx] = original
     
     mask_solid = np.ones((h, w), dtype=bool)
-    original_matched_rgb = matched_rgb.copy()
+    original_packed = pack_rgb(matched_rgb)
     
-    cache = {
-        'matched_rgb': matched_rgb.copy(),
-        'mask_solid': mask_solid,
-        'target_w': w,
-        'target_h': h,
-        'preview_rgba': np.zeros((h, w, 4), dtype=np.uint8),
-        'color_conf': {'preview': [(255, 0, 0, 255)] * 4}
-    }
-    cache['preview_rgba'][mask_solid, :3] = matched_rgb[mask_solid]
-    cache['preview_rgba'][mask_solid, 3] = 255
+    cache = _build_cache(matched_rgb, mask_solid)
     
     # Apply replacement
-    manager = ColorReplacementManager()
-    manager.add_replacement(original, replacement)
-    replacement_dict = manager.to_dict()
+    replacement_dict = {'#%02x%02x%02x' % original: '#%02x%02x%02x' % replacement}
     
     _, cache_with_replacement, _ = update_preview_with_replacements(
         cache, replacement_dict
     )
     
     # Verify replacement was applied
-    assert not np.array_equal(cache_with_replacement['matched_rgb'], original_matched_rgb), \
+    assert not np.array_equal(pack_rgb(cache_with_replacement['matched_rgb']), original_packed), \
         "Replacement should change the image"
     
     # Clear replacements (pass empty dict)
@@ -826,18 +835,15 @@ def test_property_7_preview_update_roundtrip(image_size, original, replacement):
     )
     
     # Verify original is restored
-    assert np.array_equal(cache_cleared['matched_rgb'], original_matched_rgb), \
+    assert np.array_equal(pack_rgb(cache_cleared['matched_rgb']), original_packed), \
         "Clearing replacements should restore original image"
 
 
-@settings(max_examples=20, deadline=None)
+@settings(max_examples=examples(20))
 @given(
-    image_size=st.tuples(
-        st.integers(min_value=10, max_value=30),
-        st.integers(min_value=10, max_value=30)
-    )
+    matched_rgb=rgb_images(10, 30)
 )
-def test_property_7_original_preserved_in_cache(image_size):
+def test_property_7_original_preserved_in_cache(matched_rgb):
     """
     Feature: preview-color-enhancement
     Property 7 Extension: Original Image Preserved
@@ -847,26 +853,12 @@ def test_property_7_original_preserved_in_cache(image_size):
     
     **Validates: Requirements 5.1**
     """
-    from core.converter import update_preview_with_replacements
-    from core.color_replacement import ColorReplacementManager
-    
-    h, w = image_size
+    h, w, _ = matched_rgb.shape
     
-    # Create test image
-    matched_rgb = np.random.randint(0, 256, size=(h, w, 3), dtype=np.uint8)
     mask_solid = np.ones((h, w), dtype=bool)
-    original_matched_rgb = matched_rgb.copy()
+    original_packed = pack_rgb(matched_rgb)
     
-    cache = {
-        'matched_rgb': matched_rgb.copy(),
-        'mask_solid': mask_solid,
-        'target_w': w,
-        'target_h': h,
-        'preview_rgba': np.zeros((h, w, 4), dtype=np.uint8),
-        'color_conf': {'preview': [(255, 0, 0, 255)] * 4}
-    }
-    cache['preview_rgba'][mask_solid, :3] = matched_rgb[mask_solid]
-    cache['preview_rgba'][mask_solid, 3] = 255
+    cache = _build_cache(matched_rgb, mask_solid)
     
     # Apply some replacement
     replacement_dict = {'#ff0000': '#00ff00'}
@@ -878,5 +870,5 @@ def test_property_7_original_preserved_in_cache(image_size):
     # Verify original is preserved in cache
     assert 'original_matched_rgb' in updated_cache, \
         "Cache should contain original_matched_rgb after replacement"
-    assert np.array_equal(updated_cache['original_matched_rgb'], original_matched_rgb), \
+    assert np.array_equal(pack_rgb(updated_cache['original_matched_rgb']), original_packed), \
         "original_matched_rgb should preserve the original image"
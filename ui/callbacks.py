@@ -3,10 +3,30 @@ Lumina Studio - UI Callbacks
 UI event handling callback functions
 """
 
+import os
+import sys
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
 import gradio as gr
 
 from config import ColorSystem
-from core.extractor import generate_simulated_reference
+from core.extractor import (
+    generate_simulated_reference,
+    rotate_image,
+    draw_corner_points,
+)
+from core.converter import (
+    update_preview_with_replacements,
+    generate_palette_html,
+    generate_lut_color_dropdown_html,
+    generate_highlight_preview,
+    clear_highlight_preview,
+    on_preview_click,
+    update_preview_with_loop,
+    on_remove_loop,
+)
 from utils import LUTManager
 
 
@@ -32,6 +52,24 @@ def on_lut_select(display_name):
         return None, f"❌ File not found: {display_name}"
 
 
+def on_lut_dropdown_load(display_name):
+    """
+    Fill the LUT dropdown on page load
+    
+    The preset folder scan is kept out of app construction; the dropdown is
+    built holding only the saved selection, which is dropped here if the
+    file has since disappeared.
+    
+    Returns:
+        tuple: (dropdown_update, lut_path, status_message)
+    """
+    choices = LUTManager.get_lut_choices()
+    if display_name not in choices:
+        display_name = None
+    lut_path, status = on_lut_select(display_name)
+    return gr.update(choices=choices, value=display_name), lut_path, status
+
+
 def on_lut_upload_save(uploaded_file):
     """
     Save uploaded LUT file (auto-save, no custom name needed)
@@ -80,7 +118,6 @@ def on_extractor_mode_change(img, mode):
 
 def on_extractor_rotate(i, mode):
     """Rotate image"""
-    from core.extractor import rotate_image
     if i is None:
         return None, None, [], get_first_hint(mode)
     r = rotate_image(i, "Rotate Left 90°")
@@ -89,10 +126,10 @@ def on_extractor_rotate(i, mode):
 
 def on_extractor_click(img, pts, mode, evt: gr.SelectData):
     """Set corner point by clicking image"""
-    from core.extractor import draw_corner_points
     if len(pts) >= 4:
         return img, pts, "#### ✅ 定位完成 Complete!"
-    n = pts + [[evt.index[0], evt.index[1]]]
+    x, y = evt.index[:2]
+    n = [*pts, (x, y)]
     vis = draw_corner_points(img, n, mode)
     hint = get_next_hint(mode, len(n))
     return vis, n, hint
@@ -108,6 +145,72 @@ def on_extractor_clear(img, mode):
 # Color Replacement Callbacks
 # ═══════════════════════════════════════════════════════════════
 
+# replacement_history holds one (key, old_value) diff per operation:
+# old_value None means the key was absent before. A clear-all is recorded
+# as (CLEAR_HISTORY_KEY, cleared_map).
+CLEAR_HISTORY_KEY = "__CLEAR__"
+
+# Undo depth per session; older diffs are dropped so history stays bounded
+MAX_HISTORY = 200
+
+
+def _trim_history(history):
+    """Drop the oldest entries so at most MAX_HISTORY remain (in place)."""
+    if len(history) > MAX_HISTORY:
+        del history[:len(history) - MAX_HISTORY]
+
+
+# Recent replacement renders, keyed by (id(base image), frozen map, loop params).
+# Each entry holds its base image so that id cannot be reused while cached.
+_RENDER_CACHE = OrderedDict()
+_RENDER_CACHE_SIZE = 8
+_RENDER_CACHE_LOCK = threading.Lock()  # shared by every session's worker thread
+_RENDER_CACHE_FIELDS = ('matched_rgb', 'preview_rgba', 'original_matched_rgb',
+                        'color_palette', 'used_hex_set')
+
+
+def _render_replacements(cache, replacement_map, loop_pos, add_loop,
+                         loop_width, loop_length, loop_hole, loop_angle):
+    """
+    update_preview_with_replacements with a small LRU in front of it, so
+    undo/redo back to an already rendered map state is a lookup.
+    
+    Returns:
+        tuple: (display_image, updated_cache, palette_html)
+    """
+    base = cache.get('original_matched_rgb', cache['matched_rgb'])
+    key = (
+        id(base),
+        frozenset(replacement_map.items()) if replacement_map else frozenset(),
+        tuple(loop_pos) if loop_pos is not None else None,
+        add_loop, loop_width, loop_length, loop_hole, loop_angle
+    )
+    
+    with _RENDER_CACHE_LOCK:
+        hit = _RENDER_CACHE.get(key)
+        if hit is not None and hit[0] is base:
+            _RENDER_CACHE.move_to_end(key)
+        else:
+            hit = None
+    if hit is not None:
+        _, display, fields, palette_html = hit
+        updated_cache = cache.copy()
+        updated_cache.update(fields)
+        return display, updated_cache, palette_html
+    
+    display, updated_cache, palette_html = update_preview_with_replacements(
+        cache, replacement_map, loop_pos, add_loop,
+        loop_width, loop_length, loop_hole, loop_angle
+    )
+    if updated_cache is not None:
+        fields = {k: updated_cache[k] for k in _RENDER_CACHE_FIELDS}
+        with _RENDER_CACHE_LOCK:
+            _RENDER_CACHE[key] = (base, display, fields, palette_html)
+            if len(_RENDER_CACHE) > _RENDER_CACHE_SIZE:
+                _RENDER_CACHE.popitem(last=False)
+    
+    return display, updated_cache, palette_html
+
 def on_palette_color_select(palette_html, evt: gr.SelectData):
     """
     Handle palette color selection from HTML display.
@@ -128,6 +231,34 @@ def on_palette_color_select(palette_html, evt: gr.SelectData):
     return None, "点击调色板选择颜色 | Click palette to select"
 
 
+def _record_replacement(replacement_map, replacement_history, selected_color, replacement_color):
+    """
+    Set selected_color -> replacement_color and push the undo diff.
+    
+    gr.State gives each session its own map/history, so both are updated
+    in place.
+    
+    Returns:
+        tuple: (replacement_map, replacement_history, changed)
+    """
+    new_map = replacement_map if replacement_map is not None else {}
+    new_history = replacement_history if replacement_history is not None else []
+    
+    # Mapping already in place (or same-color swap): nothing to record
+    if new_map.get(selected_color, selected_color) == replacement_color:
+        return new_map, new_history, False
+    
+    # Hex keys recur across clicks and palette sets; share one string object each
+    selected_color = sys.intern(selected_color)
+    replacement_color = sys.intern(replacement_color)
+    
+    # Record only the previous value of the changed key for undo
+    new_history.append((selected_color, new_map.get(selected_color)))
+    _trim_history(new_history)
+    new_map[selected_color] = replacement_color
+    return new_map, new_history, True
+
+
 def on_apply_color_replacement(cache, selected_color, replacement_color, 
                                replacement_map, replacement_history, loop_pos, add_loop,
                                loop_width, loop_length, loop_hole, loop_angle):
@@ -151,24 +282,23 @@ def on_apply_color_replacement(cache, selected_color, replacement_color,
         tuple: (preview_image, updated_cache, palette_html, updated_replacement_map, 
                 updated_history, status)
     """
-    from core.converter import update_preview_with_replacements, generate_palette_html
-    
     if cache is None:
         return None, None, "", replacement_map, replacement_history, "❌ 请先生成预览 | Generate preview first"
     
     if not selected_color:
         return None, cache, "", replacement_map, replacement_history, "❌ 请先选择要替换的颜色 | Select a color first"
     
-    # Save current state to history before applying new replacement
-    new_history = replacement_history.copy() if replacement_history else []
-    new_history.append(replacement_map.copy() if replacement_map else {})
+    if not replacement_color:
+        return None, cache, "", replacement_map, replacement_history, "❌ 请先选择替换颜色 | Select a replacement color first"
     
-    # Update replacement map
-    new_map = replacement_map.copy() if replacement_map else {}
-    new_map[selected_color] = replacement_color
+    new_map, new_history, changed = _record_replacement(
+        replacement_map, replacement_history, selected_color, replacement_color
+    )
+    if not changed:
+        return gr.update(), cache, gr.update(), new_map, new_history, "ℹ️ 颜色未变化 | No change"
     
     # Apply replacements and update preview
-    display, updated_cache, palette_html = update_preview_with_replacements(
+    display, updated_cache, palette_html = _render_replacements(
         cache, new_map, loop_pos, add_loop,
         loop_width, loop_length, loop_hole, loop_angle
     )
@@ -176,6 +306,64 @@ def on_apply_color_replacement(cache, selected_color, replacement_color,
     return display, updated_cache, palette_html, new_map, new_history, f"✅ 已替换 {selected_color} → {replacement_color}"
 
 
+def on_queue_color_replacement(cache, selected_color, replacement_color,
+                               replacement_map, replacement_history):
+    """
+    Record a color replacement without rendering the preview.
+    
+    The layout chains on_render_color_replacements after this with
+    trigger_mode="always_last", so several quick clicks update the map
+    one by one but share a single render of the final map.
+    
+    Args:
+        cache: Preview cache from generate_preview_cached
+        selected_color: Hex color to replace
+        replacement_color: Hex color to use as replacement
+        replacement_map: Current replacement map dict
+        replacement_history: History stack for undo
+    
+    Returns:
+        tuple: (updated_replacement_map, updated_history, status)
+    """
+    if cache is None:
+        return replacement_map, replacement_history, "❌ 请先生成预览 | Generate preview first"
+    
+    if not selected_color:
+        return replacement_map, replacement_history, "❌ 请先选择要替换的颜色 | Select a color first"
+    
+    if not replacement_color:
+        return replacement_map, replacement_history, "❌ 请先选择替换颜色 | Select a replacement color first"
+    
+    new_map, new_history, changed = _record_replacement(
+        replacement_map, replacement_history, selected_color, replacement_color
+    )
+    if not changed:
+        return new_map, new_history, "ℹ️ 颜色未变化 | No change"
+    
+    return new_map, new_history, f"✅ 已替换 {selected_color} → {replacement_color}"
+
+
+def on_render_color_replacements(cache, replacement_map,
+                                 loop_pos, add_loop,
+                                 loop_width, loop_length, loop_hole, loop_angle):
+    """
+    Render the preview for the current replacement map.
+    
+    Renders of a map state seen recently are served from the memo in
+    _render_replacements, so an unchanged map costs a lookup.
+    
+    Returns:
+        tuple: (preview_image, updated_cache, palette_html)
+    """
+    if cache is None:
+        return gr.update(), cache, gr.update()
+    
+    return _render_replacements(
+        cache, replacement_map or {}, loop_pos, add_loop,
+        loop_width, loop_length, loop_hole, loop_angle
+    )
+
+
 def on_clear_color_replacements(cache, replacement_map, replacement_history,
                                 loop_pos, add_loop,
                                 loop_width, loop_length, loop_hole, loop_angle):
@@ -197,18 +385,20 @@ def on_clear_color_replacements(cache, replacement_map, replacement_history,
         tuple: (preview_image, updated_cache, palette_html, empty_replacement_map, 
                 updated_history, status)
     """
-    from core.converter import update_preview_with_replacements, generate_palette_html
-    
     if cache is None:
         return None, None, "", {}, [], "❌ 请先生成预览 | Generate preview first"
     
-    # Save current state to history before clearing
-    new_history = replacement_history.copy() if replacement_history else []
-    if replacement_map:
-        new_history.append(replacement_map.copy())
+    # Nothing to clear: keep the current preview
+    if not replacement_map:
+        return gr.update(), cache, gr.update(), {}, replacement_history, "ℹ️ 没有颜色替换 | No replacements to clear"
+    
+    # Record the cleared map itself (it is replaced, not mutated) for undo
+    new_history = replacement_history if replacement_history is not None else []
+    new_history.append((CLEAR_HISTORY_KEY, replacement_map))
+    _trim_history(new_history)
     
     # Clear replacements by passing empty dict
-    display, updated_cache, palette_html = update_preview_with_replacements(
+    display, updated_cache, palette_html = _render_replacements(
         cache, {}, loop_pos, add_loop,
         loop_width, loop_length, loop_hole, loop_angle
     )
@@ -226,8 +416,6 @@ def on_preview_generated_update_palette(cache):
     Returns:
         tuple: (palette_html, selected_color_state)
     """
-    from core.converter import generate_palette_html
-    
     if cache is None:
         return (
             "<p style='color:#888;'>生成预览后显示调色板 | Generate preview to see palette</p>",
@@ -253,12 +441,10 @@ def on_color_swatch_click(selected_hex):
     Returns:
         tuple: (selected_color_state, display_text)
     """
-    if not selected_hex or selected_hex.strip() == "":
+    hex_color = sys.intern((selected_hex or "").strip())
+    if not hex_color:
         return None, "未选择"
     
-    # Clean up the hex value
-    hex_color = selected_hex.strip()
-    
     return hex_color, f"✅ {hex_color}"
 
 
@@ -278,6 +464,40 @@ def on_color_dropdown_select(selected_value):
     return selected_value, f"✅ {selected_value}"
 
 
+def _extract_used_hex(cache):
+    """
+    Hex colors present in the preview, for grouping the LUT color grid.
+    
+    Uses the set stored by the preview generator, falling back to the
+    palette for caches built before it was added.
+    """
+    if not cache:
+        return frozenset()
+    used = cache.get('used_hex_set')
+    if used is None:
+        used = frozenset(entry['hex'] for entry in cache.get('color_palette', ()))
+    return used
+
+
+@lru_cache(maxsize=16)
+def _lut_dropdown_html(lut_path, lut_mtime, used_hex):
+    """LUT color grid HTML, cached per (LUT file version, used colors)."""
+    return generate_lut_color_dropdown_html(lut_path, used_colors=used_hex)
+
+
+def _render_lut_dropdown(lut_path, cache):
+    """Shared body of the LUT color grid callbacks."""
+    if not lut_path:
+        return "<p style='color:#888;'>请先选择 LUT | Select LUT first</p>"
+    
+    try:
+        lut_mtime = os.path.getmtime(lut_path)
+    except OSError:
+        lut_mtime = None
+    
+    return _lut_dropdown_html(lut_path, lut_mtime, _extract_used_hex(cache))
+
+
 def on_lut_change_update_colors(lut_path, cache=None):
     """
     Update available replacement colors when LUT selection changes.
@@ -292,20 +512,7 @@ def on_lut_change_update_colors(lut_path, cache=None):
     Returns:
         str: HTML preview of LUT colors
     """
-    from core.converter import generate_lut_color_dropdown_html
-    
-    if not lut_path:
-        return "<p style='color:#888;'>请先选择 LUT | Select LUT first</p>"
-    
-    # Extract used colors from cache if available
-    used_colors = set()
-    if cache and 'color_palette' in cache:
-        for entry in cache['color_palette']:
-            used_colors.add(entry['hex'])
-    
-    html_preview = generate_lut_color_dropdown_html(lut_path, used_colors=used_colors)
-    
-    return html_preview
+    return _render_lut_dropdown(lut_path, cache)
 
 
 def on_preview_update_lut_colors(cache, lut_path):
@@ -321,20 +528,7 @@ def on_preview_update_lut_colors(cache, lut_path):
     Returns:
         str: HTML preview of LUT colors with grouping
     """
-    from core.converter import generate_lut_color_dropdown_html
-    
-    if not lut_path:
-        return "<p style='color:#888;'>请先选择 LUT | Select LUT first</p>"
-    
-    # Extract used colors from cache
-    used_colors = set()
-    if cache and 'color_palette' in cache:
-        for entry in cache['color_palette']:
-            used_colors.add(entry['hex'])
-    
-    html_preview = generate_lut_color_dropdown_html(lut_path, used_colors=used_colors)
-    
-    return html_preview
+    return _render_lut_dropdown(lut_path, cache)
 
 
 def on_lut_color_swatch_click(selected_hex):
@@ -347,12 +541,10 @@ def on_lut_color_swatch_click(selected_hex):
     Returns:
         tuple: (selected_color_state, display_text)
     """
-    if not selected_hex or selected_hex.strip() == "":
+    hex_color = sys.intern((selected_hex or "").strip())
+    if not hex_color:
         return None, "未选择替换颜色"
     
-    # Clean up the hex value
-    hex_color = selected_hex.strip()
-    
     return hex_color, f"替换为: {hex_color}"
 
 
@@ -397,18 +589,16 @@ def on_highlight_color_change(highlight_hex, cache, loop_pos, add_loop,
     Returns:
         tuple: (preview_image, status_message)
     """
-    from core.converter import generate_highlight_preview
-    
-    if not highlight_hex or highlight_hex.strip() == "":
+    hex_color = (highlight_hex or "").strip()
+    if not hex_color:
         # No highlight - return normal preview
-        from core.converter import clear_highlight_preview
         return clear_highlight_preview(
             cache, loop_pos, add_loop,
             loop_width, loop_length, loop_hole, loop_angle
         )
     
     return generate_highlight_preview(
-        cache, highlight_hex.strip(),
+        cache, hex_color,
         loop_pos, add_loop,
         loop_width, loop_length, loop_hole, loop_angle
     )
@@ -431,17 +621,11 @@ def on_clear_highlight(cache, loop_pos, add_loop,
     Returns:
         tuple: (preview_image, status_message, cleared_highlight_state)
     """
-    from core.converter import clear_highlight_preview
-    
-    print(f"[ON_CLEAR_HIGHLIGHT] Called with cache={cache is not None}, loop_pos={loop_pos}, add_loop={add_loop}")
-    
     display, status = clear_highlight_preview(
         cache, loop_pos, add_loop,
         loop_width, loop_length, loop_hole, loop_angle
     )
     
-    print(f"[ON_CLEAR_HIGHLIGHT] Returning display={display is not None}, status={status}")
-    
     return display, status, ""  # Clear the highlight state
 
 
@@ -458,7 +642,7 @@ def on_undo_color_replacement(cache, replacement_map, replacement_history,
     Args:
         cache: Preview cache from generate_preview_cached
         replacement_map: Current replacement map dict
-        replacement_history: History stack of previous states
+        replacement_history: History stack of (key, old_value) diffs
         loop_pos: Loop position tuple
         add_loop: Whether loop is enabled
         loop_width: Loop width in mm
@@ -470,22 +654,66 @@ def on_undo_color_replacement(cache, replacement_map, replacement_history,
         tuple: (preview_image, updated_cache, palette_html, updated_replacement_map, 
                 updated_history, status)
     """
-    from core.converter import update_preview_with_replacements, generate_palette_html
-    
     if cache is None:
         return None, None, "", replacement_map, replacement_history, "❌ 请先生成预览 | Generate preview first"
     
     if not replacement_history:
         return None, cache, "", replacement_map, replacement_history, "❌ 没有可撤销的操作 | Nothing to undo"
     
-    # Pop the last state from history
-    new_history = replacement_history.copy()
-    previous_map = new_history.pop()
+    # Pop the last diff from history and revert it
+    new_history = replacement_history
+    key, old_value = new_history.pop()
+    if key == CLEAR_HISTORY_KEY:
+        previous_map = old_value
+    else:
+        previous_map = replacement_map if replacement_map is not None else {}
+        if old_value is None:
+            previous_map.pop(key, None)
+        else:
+            previous_map[key] = old_value
     
     # Apply the previous replacement map
-    display, updated_cache, palette_html = update_preview_with_replacements(
+    display, updated_cache, palette_html = _render_replacements(
         cache, previous_map, loop_pos, add_loop,
         loop_width, loop_length, loop_hole, loop_angle
     )
     
     return display, updated_cache, palette_html, previous_map, new_history, "↩️ 已撤销 | Undone"
+
+
+# ═══════════════════════════════════════════════════════════════
+# Keychain Loop Callbacks
+# ═══════════════════════════════════════════════════════════════
+
+def on_preview_click_with_loop(cache, loop_pos, loop_width, loop_length,
+                               loop_hole, loop_angle, evt: gr.SelectData):
+    """
+    Place the keychain loop at the clicked point and redraw the preview.
+    
+    Fuses on_preview_click and update_preview_with_loop so a click costs
+    one server round trip instead of two.
+    
+    Returns:
+        tuple: (loop_pos, loop_enabled, loop_info, preview_image)
+    """
+    loop_pos, add_loop, pos_info = on_preview_click(cache, loop_pos, evt)
+    display = update_preview_with_loop(
+        cache, loop_pos, add_loop,
+        loop_width, loop_length, loop_hole, loop_angle
+    )
+    return loop_pos, add_loop, pos_info, display
+
+
+def on_remove_loop_with_preview(cache, loop_width, loop_length, loop_hole):
+    """
+    Remove the keychain loop and redraw the preview in the same call.
+    
+    Returns:
+        tuple: (loop_pos, loop_enabled, loop_angle, loop_info, preview_image)
+    """
+    loop_pos, add_loop, loop_angle, info = on_remove_loop()
+    display = update_preview_with_loop(
+        cache, loop_pos, add_loop,
+        loop_width, loop_length, loop_hole, loop_angle
+    )
+    return loop_pos, add_loop, loop_angle, info, display
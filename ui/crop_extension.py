@@ -6,71 +6,80 @@ This module provides image cropping capabilities without modifying the core layo
 It uses a decorator pattern to wrap the original create_app function.
 """
 
+from functools import lru_cache
+from string import Template
+
 import gradio as gr
 from core.i18n import I18n
 from core.image_preprocessor import ImagePreprocessor
 
 
-def get_crop_modal_html(lang: str) -> str:
-    """Return the crop modal HTML for the given language."""
-    title = I18n.get('crop_title', lang)
-    original_size = I18n.get('crop_original_size', lang)
-    selection_size = I18n.get('crop_selection_size', lang)
-    label_x = I18n.get('crop_x', lang)
-    label_y = I18n.get('crop_y', lang)
-    label_w = I18n.get('crop_width', lang)
-    label_h = I18n.get('crop_height', lang)
-    btn_use_original = I18n.get('crop_use_original', lang)
-    btn_confirm = I18n.get('crop_confirm', lang)
+# Crop modal styles, injected once through launch(css=...) in main.py
+CROP_MODAL_CSS = """
+#crop-modal-overlay { display: none; position: fixed; top: 0; left: 0; width: 100%; height: 100%; background: rgba(0,0,0,0.7); z-index: 9999; justify-content: center; align-items: center; }
+#crop-modal { background: white; border-radius: 12px; padding: 20px; max-width: 90vw; max-height: 90vh; overflow: auto; box-shadow: 0 10px 40px rgba(0,0,0,0.3); }
+.crop-modal-header { display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px; padding-bottom: 10px; border-bottom: 1px solid #eee; }
+.crop-modal-header h3 { margin: 0; color: #333; }
+.crop-modal-close { background: none; border: none; font-size: 24px; cursor: pointer; color: #666; }
+.crop-modal-close:hover { color: #333; }
+.crop-image-container { max-width: 800px; max-height: 500px; margin: 0 auto; }
+.crop-image-container img { max-width: 100%; display: block; }
+.crop-info-bar { display: flex; justify-content: space-between; align-items: center; margin: 15px 0; padding: 10px; background: #f5f5f5; border-radius: 6px; font-size: 14px; }
+.crop-inputs { display: flex; gap: 15px; margin: 15px 0; flex-wrap: wrap; }
+.crop-input-group { display: flex; flex-direction: column; gap: 5px; }
+.crop-input-group label { font-size: 12px; color: #666; }
+.crop-input-group input { width: 80px; padding: 8px; border: 1px solid #ddd; border-radius: 4px; font-size: 14px; }
+.crop-modal-buttons { display: flex; gap: 10px; justify-content: flex-end; margin-top: 15px; padding-top: 15px; border-top: 1px solid #eee; }
+.crop-btn { padding: 10px 20px; border: none; border-radius: 6px; cursor: pointer; font-size: 14px; transition: all 0.2s; }
+.crop-btn-secondary { background: #f0f0f0; color: #333; }
+.crop-btn-secondary:hover { background: #e0e0e0; }
+.crop-btn-primary { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; }
+.crop-btn-primary:hover { opacity: 0.9; }
+"""
 
-    # Cropper.js Modal HTML (CSS only, JS is loaded via head parameter in main.py)
-    template = """
-<style>
-#crop-modal-overlay {{ display: none; position: fixed; top: 0; left: 0; width: 100%; height: 100%; background: rgba(0,0,0,0.7); z-index: 9999; justify-content: center; align-items: center; }}
-#crop-modal {{ background: white; border-radius: 12px; padding: 20px; max-width: 90vw; max-height: 90vh; overflow: auto; box-shadow: 0 10px 40px rgba(0,0,0,0.3); }}
-.crop-modal-header {{ display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px; padding-bottom: 10px; border-bottom: 1px solid #eee; }}
-.crop-modal-header h3 {{ margin: 0; color: #333; }}
-.crop-modal-close {{ background: none; border: none; font-size: 24px; cursor: pointer; color: #666; }}
-.crop-modal-close:hover {{ color: #333; }}
-.crop-image-container {{ max-width: 800px; max-height: 500px; margin: 0 auto; }}
-.crop-image-container img {{ max-width: 100%; display: block; }}
-.crop-info-bar {{ display: flex; justify-content: space-between; align-items: center; margin: 15px 0; padding: 10px; background: #f5f5f5; border-radius: 6px; font-size: 14px; }}
-.crop-inputs {{ display: flex; gap: 15px; margin: 15px 0; flex-wrap: wrap; }}
-.crop-input-group {{ display: flex; flex-direction: column; gap: 5px; }}
-.crop-input-group label {{ font-size: 12px; color: #666; }}
-.crop-input-group input {{ width: 80px; padding: 8px; border: 1px solid #ddd; border-radius: 4px; font-size: 14px; }}
-.crop-modal-buttons {{ display: flex; gap: 10px; justify-content: flex-end; margin-top: 15px; padding-top: 15px; border-top: 1px solid #eee; }}
-.crop-btn {{ padding: 10px 20px; border: none; border-radius: 6px; cursor: pointer; font-size: 14px; transition: all 0.2s; }}
-.crop-btn-secondary {{ background: #f0f0f0; color: #333; }}
-.crop-btn-secondary:hover {{ background: #e0e0e0; }}
-.crop-btn-primary {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; }}
-.crop-btn-primary:hover {{ opacity: 0.9; }}
-</style>
+
+# Cropper.js Modal HTML (CSS is CROP_MODAL_CSS via launch(css=...), JS via head= in main.py)
+_CROP_MODAL_TEMPLATE = Template("""
 <div id="crop-modal-overlay">
     <div id="crop-modal">
         <div class="crop-modal-header">
-            <h3>{title}</h3>
+            <h3>${title}</h3>
             <button class="crop-modal-close" onclick="window.closeCropModal()">&times;</button>
         </div>
         <div class="crop-image-container"><img id="crop-image" src="" alt="Crop Preview"></div>
         <div class="crop-info-bar">
-            <span id="crop-original-size" data-prefix="{original_size}">{original_size}: -- × -- px</span>
-            <span id="crop-selection-size" data-prefix="{selection_size}">{selection_size}: -- × -- px</span>
+            <span id="crop-original-size" data-prefix="${original_size}">${original_size}: -- × -- px</span>
+            <span id="crop-selection-size" data-prefix="${selection_size}">${selection_size}: -- × -- px</span>
         </div>
         <div class="crop-inputs">
-            <div class="crop-input-group"><label>{label_x}</label><input type="number" id="crop-x" value="0" min="0" oninput="window.updateCropperFromInputs()"></div>
-            <div class="crop-input-group"><label>{label_y}</label><input type="number" id="crop-y" value="0" min="0" oninput="window.updateCropperFromInputs()"></div>
-            <div class="crop-input-group"><label>{label_w}</label><input type="number" id="crop-width" value="100" min="1" oninput="window.updateCropperFromInputs()"></div>
-            <div class="crop-input-group"><label>{label_h}</label><input type="number" id="crop-height" value="100" min="1" oninput="window.updateCropperFromInputs()"></div>
+            <div class="crop-input-group"><label>${label_x}</label><input type="number" id="crop-x" value="0" min="0" oninput="window.updateCropperFromInputs()"></div>
+            <div class="crop-input-group"><label>${label_y}</label><input type="number" id="crop-y" value="0" min="0" oninput="window.updateCropperFromInputs()"></div>
+            <div class="crop-input-group"><label>${label_w}</label><input type="number" id="crop-width" value="100" min="1" oninput="window.updateCropperFromInputs()"></div>
+            <div class="crop-input-group"><label>${label_h}</label><input type="number" id="crop-height" value="100" min="1" oninput="window.updateCropperFromInputs()"></div>
         </div>
         <div class="crop-modal-buttons">
-            <button class="crop-btn crop-btn-secondary" onclick="window.useOriginalImage()">{btn_use_original}</button>
-            <button class="crop-btn crop-btn-primary" onclick="window.confirmCrop()">{btn_confirm}</button>
+            <button class="crop-btn crop-btn-secondary" onclick="window.useOriginalImage()">${btn_use_original}</button>
+            <button class="crop-btn crop-btn-primary" onclick="window.confirmCrop()">${btn_confirm}</button>
         </div>
     </div>
 </div>
-"""
-    return template.format(
+""")
+
+
+@lru_cache(maxsize=8)
+def get_crop_modal_html(lang: str) -> str:
+    """Return the crop modal HTML for the given language (cached per language)."""
+    title = I18n.get('crop_title', lang)
+    original_size = I18n.get('crop_original_size', lang)
+    selection_size = I18n.get('crop_selection_size', lang)
+    label_x = I18n.get('crop_x', lang)
+    label_y = I18n.get('crop_y', lang)
+    label_w = I18n.get('crop_width', lang)
+    label_h = I18n.get('crop_height', lang)
+    btn_use_original = I18n.get('crop_use_original', lang)
+    btn_confirm = I18n.get('crop_confirm', lang)
+
+    return _CROP_MODAL_TEMPLATE.substitute(
         title=title,
         original_size=original_size,
         selection_size=selection_size,
@@ -8,6 +8,7 @@ import os
 import shutil
 import time
 import zipfile
+from functools import lru_cache
 from pathlib import Path
 
 import gradio as gr
@@ -15,7 +16,7 @@ from PIL import Image as PILImage
 
 from core.i18n import I18n
 from config import ColorSystem
-from utils import Stats, LUTManager
+from utils import Stats
 from core.calibration import generate_calibration_board, generate_smart_board
 from core.extractor import (
     rotate_image,
@@ -27,9 +28,7 @@ from core.extractor import (
 from core.converter import (
     generate_preview_cached,
     render_preview,
-    on_preview_click,
     update_preview_with_loop,
-    on_remove_loop,
     generate_final_model
 )
 from .styles import CUSTOM_CSS
@@ -42,8 +41,10 @@ from .callbacks import (
     on_extractor_click,
     on_extractor_clear,
     on_lut_select,
+    on_lut_dropdown_load,
     on_lut_upload_save,
-    on_apply_color_replacement,
+    on_queue_color_replacement,
+    on_render_color_replacements,
     on_clear_color_replacements,
     on_undo_color_replacement,
     on_preview_generated_update_palette,
@@ -53,7 +54,9 @@ from .callbacks import (
     on_replacement_color_select,
     on_preview_update_lut_colors,
     on_highlight_color_change,
-    on_clear_highlight
+    on_clear_highlight,
+    on_preview_click_with_loop,
+    on_remove_loop_with_preview
 )
 
 # Runtime-injected i18n keys (avoids editing core/i18n.py).
@@ -67,6 +70,22 @@ if hasattr(I18n, 'TEXTS'):
         'conv_lut_status': {'zh': '💡 拖放.npy文件自动添加', 'en': '💡 Drop .npy file to load'},
     })
 
+# Radio (label, value) choices per language, built once. Values are the
+# English labels so callbacks see the same value whatever the UI language.
+_CHOICE_TABLES = {
+    name: {
+        lang: tuple((I18n.get(k, lang), I18n.get(k, 'en')) for k in keys) + extra
+        for lang in ('zh', 'en')
+    }
+    for name, keys, extra in (
+        ('color_mode', ('conv_color_mode_cmyw', 'conv_color_mode_rybw'),
+         (("6-Color (Smart 1296)", "6-Color (Smart 1296)"),)),
+        ('structure', ('conv_structure_double', 'conv_structure_single'), ()),
+        ('modeling_mode', ('conv_modeling_mode_hifi', 'conv_modeling_mode_pixel',
+                           'conv_modeling_mode_vector'), ()),
+    )
+}
+
 CONFIG_FILE = "user_settings.json"
 
 
@@ -456,9 +475,10 @@ def create_app():
 
         # Header
         with gr.Row(elem_classes=["header-row"], equal_height=True):
+            header_value, stats_value, footer_value = _get_page_html("zh")
             with gr.Column(scale=10):
                 app_title_html = gr.HTML(
-                    value=f"<h1>✨ Lumina Studio</h1><p>{I18n.get('app_subtitle', 'zh')}</p>",
+                    value=header_value,
                     elem_id="app-header"
                 )
             with gr.Column(scale=1, min_width=120):
@@ -468,9 +488,8 @@ def create_app():
                     elem_id="lang-btn"
                 )
         
-        stats = Stats.get_all()
         stats_html = gr.HTML(
-            value=_get_stats_html("zh", stats),
+            value=stats_value,
             elem_id="stats-bar"
         )
         
@@ -490,7 +509,7 @@ def create_app():
             tab_components['tab_calibration'] = tab_cal
             
             with gr.TabItem(label=I18n.get('tab_extractor', "zh"), id=2) as tab_ext:
-                ext_components = create_extractor_tab_content("zh")
+                ext_components = create_extractor_tab_content("zh", tab=tab_ext)
                 components.update(ext_components)
             tab_components['tab_extractor'] = tab_ext
             
@@ -500,28 +519,32 @@ def create_app():
             tab_components['tab_about'] = tab_about
         
         footer_html = gr.HTML(
-            value=_get_footer_html("zh"),
+            value=footer_value,
             elem_id="footer"
         )
         
+        component_specs = _build_component_specs(components)
+
         def change_language(current_lang):
             """Switch UI language and return updates for all i18n components."""
             new_lang = "en" if current_lang == "zh" else "zh"
+            header_value, stats_value, footer_value = _get_page_html(new_lang)
             updates = []
             updates.append(gr.update(value=I18n.get('lang_btn_zh' if new_lang == "zh" else 'lang_btn_en', new_lang)))
-            updates.append(gr.update(value=_get_header_html(new_lang)))
-            stats = Stats.get_all()
-            updates.append(gr.update(value=_get_stats_html(new_lang, stats)))
+            updates.append(gr.update(value=header_value))
+            updates.append(gr.update(value=stats_value))
             updates.append(gr.update(label=I18n.get('tab_converter', new_lang)))
             updates.append(gr.update(label=I18n.get('tab_calibration', new_lang)))
             updates.append(gr.update(label=I18n.get('tab_extractor', new_lang)))
             updates.append(gr.update(label=I18n.get('tab_about', new_lang)))
-            updates.extend(_get_all_component_updates(new_lang, components))
-            updates.append(gr.update(value=_get_footer_html(new_lang)))
+            updates.extend(_get_all_component_updates(new_lang, component_specs))
+            updates.append(gr.update(value=footer_value))
             updates.append(new_lang)
             return updates
 
-        output_list = [
+        # Fixed for the app's lifetime; must line up one-to-one with the list
+        # change_language returns
+        fixed_head = [
             lang_btn,
             app_title_html,
             stats_html,
@@ -530,8 +553,16 @@ def create_app():
             tab_components['tab_extractor'],
             tab_components['tab_about'],
         ]
-        output_list.extend(_get_component_list(components))
-        output_list.extend([footer_html, lang_state])
+        fixed_tail = [footer_html, lang_state]
+        output_list = tuple(
+            fixed_head + _get_component_list(component_specs) + fixed_tail
+        )
+        if len(output_list) != len(fixed_head) + len(component_specs) + len(fixed_tail):
+            raise RuntimeError(
+                f"change_language outputs ({len(output_list)}) do not match "
+                f"the component specs ({len(component_specs)} + "
+                f"{len(fixed_head) + len(fixed_tail)} fixed)"
+            )
 
         lang_btn.click(
             change_language,
@@ -540,9 +571,10 @@ def create_app():
         )
 
         app.load(
-            fn=on_lut_select,
+            fn=on_lut_dropdown_load,
             inputs=[components['dropdown_conv_lut_dropdown']],
-            outputs=[components['state_conv_lut_path'], components['md_conv_lut_status']]
+            outputs=[components['dropdown_conv_lut_dropdown'],
+                     components['state_conv_lut_path'], components['md_conv_lut_status']]
         ).then(
             fn=on_lut_change_update_colors,
             inputs=[components['state_conv_lut_path']],
@@ -554,23 +586,44 @@ def create_app():
 
 # ---------- Helpers for i18n updates ----------
 
+_stats_snapshot = {'version': None, 'counts': None}
+
+
+def _get_stats_snapshot() -> tuple:
+    """Return Stats.get_counts(), re-reading the stats file only after a write."""
+    version = Stats.get_version()
+    if _stats_snapshot['version'] != version:
+        _stats_snapshot['counts'] = Stats.get_counts()
+        _stats_snapshot['version'] = version
+    return _stats_snapshot['counts']
+
+
+@lru_cache(maxsize=4)
 def _get_header_html(lang: str) -> str:
     """Return header HTML (title + subtitle) for the given language."""
     return f"<h1>✨ Lumina Studio</h1><p>{I18n.get('app_subtitle', lang)}</p>"
 
 
-def _get_stats_html(lang: str, stats: dict) -> str:
-    """Return stats bar HTML (calibrations / extractions / conversions)."""
+@lru_cache(maxsize=16)
+def _get_stats_html(lang: str, counts: tuple) -> str:
+    """Return stats bar HTML, cached per language and counts.
+
+    Args:
+        lang: Language code ('zh' or 'en').
+        counts: (calibrations, extractions, conversions) from Stats.get_counts().
+    """
+    calibrations, extractions, conversions = counts
     return f"""
     <div class="stats-bar">
         {I18n.get('stats_total', lang)}: 
-        <strong>{stats.get('calibrations', 0)}</strong> {I18n.get('stats_calibrations', lang)} | 
-        <strong>{stats.get('extractions', 0)}</strong> {I18n.get('stats_extractions', lang)} | 
-        <strong>{stats.get('conversions', 0)}</strong> {I18n.get('stats_conversions', lang)}
+        <strong>{calibrations}</strong> {I18n.get('stats_calibrations', lang)} | 
+        <strong>{extractions}</strong> {I18n.get('stats_extractions', lang)} | 
+        <strong>{conversions}</strong> {I18n.get('stats_conversions', lang)}
     </div>
     """
 
 
+@lru_cache(maxsize=4)
 def _get_footer_html(lang: str) -> str:
     """Return footer HTML for the given language."""
     return f"""
@@ -580,113 +633,183 @@ def _get_footer_html(lang: str) -> str:
     """
 
 
-def _get_all_component_updates(lang: str, components: dict) -> list:
-    """Build a list of gr.update() for all components to apply i18n.
+def _get_page_html(lang: str) -> tuple:
+    """Return (header, stats bar, footer) HTML for the given language.
+
+    The three page-chrome blocks always change together, so they are
+    rendered in one call from the cached builders above.
+    """
+    return (
+        _get_header_html(lang),
+        _get_stats_html(lang, _get_stats_snapshot()),
+        _get_footer_html(lang),
+    )
+
+
+# Dynamic status components whose runtime text must survive a language switch
+_I18N_SKIP_KEYS = frozenset(('md_conv_lut_status', 'textbox_conv_status'))
+
+# Component key prefix -> update kind (the rest of the key is the i18n key)
+_PREFIX_KINDS = {
+    'md': 'value',
+    'btn': 'value',
+    'html': 'value',
+    'lbl': 'label',
+    'slider': 'label',
+    'image': 'label',
+    'file': 'label',
+    'textbox': 'label',
+    'num': 'label',
+    'accordion': 'label',
+    'checkbox': 'label_info',
+    'dropdown': 'label_info',
+    'radio': 'radio',
+}
+
+# Keys whose text differs between languages. Plain text updates for any
+# other key would resend what the component already shows (or, for keys
+# missing from I18n.TEXTS, overwrite it with the bare key).
+_LANG_DEPENDENT_KEYS = frozenset(
+    key for key in I18n.TEXTS if I18n.get(key, 'zh') != I18n.get(key, 'en')
+)
+
+# Update kinds that only set translated text
+_TEXT_KINDS = frozenset(('value', 'label', 'label_info'))
+
+# Radio i18n key -> kind whose builder also localizes the choices
+_RADIO_KINDS = {
+    'conv_color_mode': 'radio_color_mode',
+    'cal_color_mode': 'radio_color_mode',
+    'ext_color_mode': 'radio_color_mode',
+    'conv_structure': 'radio_structure',
+    'conv_modeling_mode': 'radio_modeling_mode',
+}
 
-    Skips dynamic status components (md_conv_lut_status, textbox_conv_status)
-    so their runtime text is not overwritten.
+
+def _build_component_specs(components: dict) -> list:
+    """Classify every component key once for language switching.
+
+    The key prefix decides what a language switch updates; resolving it here
+    leaves change_language with a plain table walk.
 
     Args:
-        lang: Target language code ('zh' or 'en').
         components: Dict of component key -> Gradio component.
 
     Returns:
-        list: One gr.update() per component, in dict iteration order.
+        list: One (component, kind, i18n_key, info_key) tuple per localized
+        component, in dict iteration order. kind selects a builder in _KIND_BUILDERS.
+        Both the click outputs and the updates are read from this one list,
+        so they cannot drift out of order.
     """
-    updates = []
+    specs = []
     for key, component in components.items():
-        if key == 'md_conv_lut_status' or key == 'textbox_conv_status':
-            updates.append(gr.update())
-            continue
+        prefix, _, i18n_key = key.partition('_')
+        kind = _PREFIX_KINDS.get(prefix, 'noop')
+        info_key = None
 
-        if key.startswith('md_'):
-            updates.append(gr.update(value=I18n.get(key[3:], lang)))
-        elif key.startswith('lbl_'):
-            updates.append(gr.update(label=I18n.get(key[4:], lang)))
-        elif key.startswith('btn_'):
-            updates.append(gr.update(value=I18n.get(key[4:], lang)))
-        elif key.startswith('radio_'):
-            choice_key = key[6:]
-            if choice_key == 'conv_color_mode' or choice_key == 'cal_color_mode' or choice_key == 'ext_color_mode':
-                updates.append(gr.update(
-                    label=I18n.get(choice_key, lang),
-                    choices=[
-                        (I18n.get('conv_color_mode_cmyw', lang), I18n.get('conv_color_mode_cmyw', 'en')),
-                        (I18n.get('conv_color_mode_rybw', lang), I18n.get('conv_color_mode_rybw', 'en')),
-                        ("6-Color (Smart 1296)", "6-Color (Smart 1296)")
-                    ]
-                ))
-            elif choice_key == 'conv_structure':
-                updates.append(gr.update(
-                    label=I18n.get(choice_key, lang),
-                    choices=[
-                        (I18n.get('conv_structure_double', lang), I18n.get('conv_structure_double', 'en')),
-                        (I18n.get('conv_structure_single', lang), I18n.get('conv_structure_single', 'en'))
-                    ]
-                ))
-            elif choice_key == 'conv_modeling_mode':
-                updates.append(gr.update(
-                    label=I18n.get(choice_key, lang),
-                    info=I18n.get('conv_modeling_mode_info', lang),
-                    choices=[
-                        (I18n.get('conv_modeling_mode_hifi', lang), I18n.get('conv_modeling_mode_hifi', 'en')),
-                        (I18n.get('conv_modeling_mode_pixel', lang), I18n.get('conv_modeling_mode_pixel', 'en')),
-                        (I18n.get('conv_modeling_mode_vector', lang), I18n.get('conv_modeling_mode_vector', 'en'))
-                    ]
-                ))
-        elif key.startswith('slider_'):
-            slider_key = key[7:]
-            updates.append(gr.update(label=I18n.get(slider_key, lang)))
-        elif key.startswith('checkbox_'):
-            checkbox_key = key[9:]
-            info_key = checkbox_key + '_info'
-            if info_key in I18n.TEXTS:
-                updates.append(gr.update(
-                    label=I18n.get(checkbox_key, lang),
-                    info=I18n.get(info_key, lang)
-                ))
-            else:
-                updates.append(gr.update(label=I18n.get(checkbox_key, lang)))
-        elif key.startswith('dropdown_'):
-            dropdown_key = key[9:]
-            info_key = dropdown_key + '_info'
-            if info_key in I18n.TEXTS:
-                updates.append(gr.update(
-                    label=I18n.get(dropdown_key, lang),
-                    info=I18n.get(info_key, lang)
-                ))
-            else:
-                updates.append(gr.update(label=I18n.get(dropdown_key, lang)))
-        elif key.startswith('image_'):
-            image_key = key[6:]
-            updates.append(gr.update(label=I18n.get(image_key, lang)))
-        elif key.startswith('file_'):
-            file_key = key[5:]
-            updates.append(gr.update(label=I18n.get(file_key, lang)))
-        elif key.startswith('textbox_'):
-            textbox_key = key[8:]
-            updates.append(gr.update(label=I18n.get(textbox_key, lang)))
-        elif key.startswith('num_'):
-            num_key = key[4:]
-            updates.append(gr.update(label=I18n.get(num_key, lang)))
+        if key in _I18N_SKIP_KEYS:
+            kind = 'noop'
         elif key == 'html_crop_modal':
-            from ui.crop_extension import get_crop_modal_html
-            updates.append(gr.update(value=get_crop_modal_html(lang)))
-        elif key.startswith('html_'):
-            html_key = key[5:]
-            updates.append(gr.update(value=I18n.get(html_key, lang)))
-        elif key.startswith('accordion_'):
-            acc_key = key[10:]
-            updates.append(gr.update(label=I18n.get(acc_key, lang)))
-        else:
-            updates.append(gr.update())
-    
-    return updates
+            kind = 'crop_modal'
+        elif kind == 'radio':
+            kind = _RADIO_KINDS.get(i18n_key, 'noop')
+        elif kind == 'label_info':
+            info_key = i18n_key + '_info'
+            if info_key not in I18n.TEXTS:
+                kind, info_key = 'label', None
+
+        if (kind in _TEXT_KINDS
+                and i18n_key not in _LANG_DEPENDENT_KEYS
+                and info_key not in _LANG_DEPENDENT_KEYS):
+            kind = 'noop'
+
+        # Components with nothing to localize stay out of the outputs entirely
+        if kind != 'noop':
+            specs.append((component, kind, i18n_key, info_key))
+    return specs
+
+
+@lru_cache(maxsize=2)
+def _lang_texts(lang: str) -> dict:
+    """Every I18n text resolved for one language, built on first use.
+
+    Language switching and the extractor tab builder read this table with
+    plain dict lookups instead of calling I18n.get (with its fallback chain)
+    once per component.
+    """
+    return I18n.get_all(lang)
+
+
+def _color_mode_radio_update(lang, texts, i18n_key, info_key):
+    return gr.update(
+        label=texts.get(i18n_key, i18n_key),
+        choices=list(_CHOICE_TABLES['color_mode'][lang])
+    )
 
 
-def _get_component_list(components: dict) -> list:
-    """Return component values in dict order (for Gradio outputs)."""
-    return list(components.values())
+def _structure_radio_update(lang, texts, i18n_key, info_key):
+    return gr.update(
+        label=texts.get(i18n_key, i18n_key),
+        choices=list(_CHOICE_TABLES['structure'][lang])
+    )
+
+
+def _modeling_mode_radio_update(lang, texts, i18n_key, info_key):
+    return gr.update(
+        label=texts.get(i18n_key, i18n_key),
+        info=texts['conv_modeling_mode_info'],
+        choices=list(_CHOICE_TABLES['modeling_mode'][lang])
+    )
+
+
+def _crop_modal_update(lang, texts, i18n_key, info_key):
+    from ui.crop_extension import get_crop_modal_html
+    return gr.update(value=get_crop_modal_html(lang))
+
+
+# kind -> builder(lang, texts, i18n_key, info_key) returning one gr.update();
+# texts is _lang_texts(lang)
+_KIND_BUILDERS = {
+    'value': lambda lang, texts, i18n_key, info_key: gr.update(value=texts.get(i18n_key, i18n_key)),
+    'label': lambda lang, texts, i18n_key, info_key: gr.update(label=texts.get(i18n_key, i18n_key)),
+    'label_info': lambda lang, texts, i18n_key, info_key: gr.update(
+        label=texts.get(i18n_key, i18n_key),
+        info=texts[info_key]
+    ),
+    'radio_color_mode': _color_mode_radio_update,
+    'radio_structure': _structure_radio_update,
+    'radio_modeling_mode': _modeling_mode_radio_update,
+    'crop_modal': _crop_modal_update,
+}
+
+
+def _get_all_component_updates(lang: str, component_specs: list) -> list:
+    """Build a list of gr.update() for all components to apply i18n.
+
+    Dynamic status components (md_conv_lut_status, textbox_conv_status) and
+    components without i18n text have no spec, so they are not touched.
+
+    Args:
+        lang: Target language code ('zh' or 'en').
+        component_specs: Output of _build_component_specs.
+
+    Returns:
+        list: One gr.update() per component, in component order.
+    """
+    texts = _lang_texts(lang)
+    return [
+        _KIND_BUILDERS[kind](lang, texts, i18n_key, info_key)
+        for _, kind, i18n_key, info_key in component_specs
+    ]
+
+
+def _get_component_list(component_specs: list) -> list:
+    """Return the components in spec order (for Gradio outputs)."""
+    return [spec[0] for spec in component_specs]
+
+
+# Reference images already loaded or generated this process, by filename
+_REFERENCE_IMAGES = {}
 
 
 def get_extractor_reference_image(mode_str):
@@ -694,6 +817,8 @@ def get_extractor_reference_image(mode_str):
 
     Uses assets/ with filenames ref_6color_smart.png, ref_cmyw_standard.png,
     or ref_rybw_standard.png. Generates via calibration board logic if missing.
+    Each image is read (or generated) once per process and then served from
+    memory.
 
     Args:
         mode_str: Color mode label (e.g. "6-Color", "CMYW", "RYBW").
@@ -701,10 +826,6 @@ def get_extractor_reference_image(mode_str):
     Returns:
         PIL.Image.Image | None: Reference image or None on error.
     """
-    cache_dir = "assets"
-    if not os.path.exists(cache_dir):
-        os.makedirs(cache_dir, exist_ok=True)
-
     if "6-Color" in mode_str or "1296" in mode_str:
         filename = "ref_6color_smart.png"
         gen_mode = "6-Color"
@@ -715,12 +836,28 @@ def get_extractor_reference_image(mode_str):
         filename = "ref_rybw_standard.png"
         gen_mode = "RYBW"
 
+    img = _REFERENCE_IMAGES.get(filename)
+    if img is None:
+        img = _load_reference_image(filename, gen_mode)
+        if img is not None:
+            _REFERENCE_IMAGES[filename] = img
+    return img
+
+
+def _load_reference_image(filename, gen_mode):
+    """Read a reference image from assets/, generating and saving it if missing."""
+    cache_dir = "assets"
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+
     filepath = os.path.join(cache_dir, filename)
 
     if os.path.exists(filepath):
         try:
             print(f"[UI] Loading reference from cache: {filepath}")
-            return PILImage.open(filepath)
+            img = PILImage.open(filepath)
+            img.load()  # decode now; the cached image must not hold the file open
+            return img
         except Exception as e:
             print(f"Error loading cache, regenerating: {e}")
 
@@ -752,6 +889,21 @@ def get_extractor_reference_image(mode_str):
         return None
 
 
+def _load_extractor_reference_once(mode_str, loaded):
+    """Extractor tab.select handler: fill the reference view on the first select.
+
+    Later selects leave the view alone; mode changes refresh it through the
+    color mode radio instead.
+
+    Returns:
+        tuple: (reference image or gr.update(), loaded flag)
+    """
+    if loaded:
+        return gr.update(), True
+    img = get_extractor_reference_image(mode_str)
+    return img, img is not None
+
+
 # ---------- Tab builders ----------
 
 def create_converter_tab_content(lang: str) -> dict:
@@ -771,15 +923,14 @@ def create_converter_tab_content(lang: str) -> dict:
         with gr.Column(scale=1, min_width=320, elem_classes=["left-sidebar"]):
             components['md_conv_input_section'] = gr.Markdown(I18n.get('conv_input_section', lang))
 
+            # Full choice list is filled in by app.load (on_lut_dropdown_load)
             saved_lut = load_last_lut_setting()
-            current_choices = LUTManager.get_lut_choices()
-            default_lut_value = saved_lut if saved_lut in current_choices else None
 
             with gr.Row():
                 components['dropdown_conv_lut_dropdown'] = gr.Dropdown(
-                    choices=current_choices,
+                    choices=[saved_lut] if saved_lut else [],
                     label="校准数据 (.npy) / Calibration Data",
-                    value=default_lut_value,
+                    value=saved_lut,
                     interactive=True,
                     scale=2
                 )
@@ -879,31 +1030,20 @@ def create_converter_tab_content(lang: str) -> dict:
 
             with gr.Row(elem_classes=["compact-row"]):
                 components['radio_conv_color_mode'] = gr.Radio(
-                    choices=[
-                        (I18n.get('conv_color_mode_cmyw', lang), I18n.get('conv_color_mode_cmyw', 'en')),
-                        (I18n.get('conv_color_mode_rybw', lang), I18n.get('conv_color_mode_rybw', 'en')),
-                        ("6-Color (Smart 1296)", "6-Color (Smart 1296)")
-                    ],
+                    choices=list(_CHOICE_TABLES['color_mode'][lang]),
                     value=I18n.get('conv_color_mode_rybw', 'en'),
                     label=I18n.get('conv_color_mode', lang)
                 )
                 
                 components['radio_conv_structure'] = gr.Radio(
-                    choices=[
-                        (I18n.get('conv_structure_double', lang), I18n.get('conv_structure_double', 'en')),
-                        (I18n.get('conv_structure_single', lang), I18n.get('conv_structure_single', 'en'))
-                    ],
+                    choices=list(_CHOICE_TABLES['structure'][lang]),
                     value=I18n.get('conv_structure_double', 'en'),
                     label=I18n.get('conv_structure', lang)
                 )
 
             with gr.Row(elem_classes=["compact-row"]):
                 components['radio_conv_modeling_mode'] = gr.Radio(
-                    choices=[
-                        (I18n.get('conv_modeling_mode_hifi', lang), I18n.get('conv_modeling_mode_hifi', 'en')),
-                        (I18n.get('conv_modeling_mode_pixel', lang), I18n.get('conv_modeling_mode_pixel', 'en')),
-                        (I18n.get('conv_modeling_mode_vector', lang), I18n.get('conv_modeling_mode_vector', 'en'))
-                    ],
+                    choices=list(_CHOICE_TABLES['modeling_mode'][lang]),
                     value=I18n.get('conv_modeling_mode_hifi', 'en'),
                     label=I18n.get('conv_modeling_mode', lang),
                     info=I18n.get('conv_modeling_mode_info', lang),
@@ -1403,15 +1543,26 @@ def create_converter_tab_content(lang: str) -> dict:
     )
     
     # Color replacement: Apply replacement
+    # Recording is instant and runs for every click; the render is chained
+    # with always_last so rapid clicks coalesce into one render of the final map
     conv_apply_replacement.click(
-            on_apply_color_replacement,
+            on_queue_color_replacement,
             inputs=[
                 conv_preview_cache, conv_selected_color, conv_replacement_color_state,
-                conv_replacement_map, conv_replacement_history, conv_loop_pos, components['checkbox_conv_loop_enable'],
+                conv_replacement_map, conv_replacement_history
+            ],
+            outputs=[conv_replacement_map, conv_replacement_history, components['textbox_conv_status']],
+            queue=False,
+            trigger_mode="multiple"
+    ).then(
+            on_render_color_replacements,
+            inputs=[
+                conv_preview_cache, conv_replacement_map, conv_loop_pos, components['checkbox_conv_loop_enable'],
                 components['slider_conv_loop_width'], components['slider_conv_loop_length'],
                 components['slider_conv_loop_hole'], components['slider_conv_loop_angle']
             ],
-            outputs=[conv_preview, conv_preview_cache, conv_palette_html, conv_replacement_map, conv_replacement_history, components['textbox_conv_status']]
+            outputs=[conv_preview, conv_preview_cache, conv_palette_html],
+            trigger_mode="always_last"
     )
     
     # Color replacement: Undo last replacement
@@ -1439,30 +1590,25 @@ def create_converter_tab_content(lang: str) -> dict:
     )
     
     conv_preview.select(
-            on_preview_click,
-            inputs=[conv_preview_cache, conv_loop_pos],
-            outputs=[conv_loop_pos, components['checkbox_conv_loop_enable'], components['textbox_conv_loop_info']]
-    ).then(
-            update_preview_with_loop,
+            on_preview_click_with_loop,
             inputs=[
-                conv_preview_cache, conv_loop_pos, components['checkbox_conv_loop_enable'],
+                conv_preview_cache, conv_loop_pos,
                 components['slider_conv_loop_width'], components['slider_conv_loop_length'],
                 components['slider_conv_loop_hole'], components['slider_conv_loop_angle']
             ],
-            outputs=[conv_preview]
+            outputs=[conv_loop_pos, components['checkbox_conv_loop_enable'],
+                    components['textbox_conv_loop_info'], conv_preview]
     )
     components['btn_conv_loop_remove'].click(
-            on_remove_loop,
-            outputs=[conv_loop_pos, components['checkbox_conv_loop_enable'], 
-                    components['slider_conv_loop_angle'], components['textbox_conv_loop_info']]
-    ).then(
-            update_preview_with_loop,
+            on_remove_loop_with_preview,
             inputs=[
-                conv_preview_cache, conv_loop_pos, components['checkbox_conv_loop_enable'],
+                conv_preview_cache,
                 components['slider_conv_loop_width'], components['slider_conv_loop_length'],
-                components['slider_conv_loop_hole'], components['slider_conv_loop_angle']
+                components['slider_conv_loop_hole']
             ],
-            outputs=[conv_preview]
+            outputs=[conv_loop_pos, components['checkbox_conv_loop_enable'],
+                    components['slider_conv_loop_angle'], components['textbox_conv_loop_info'],
+                    conv_preview]
     )
     loop_params = [
             components['slider_conv_loop_width'],
@@ -1470,16 +1616,21 @@ def create_converter_tab_content(lang: str) -> dict:
             components['slider_conv_loop_hole'],
             components['slider_conv_loop_angle']
     ]
-    for param in loop_params:
-            param.change(
-                update_preview_with_loop,
-                inputs=[
-                    conv_preview_cache, conv_loop_pos, components['checkbox_conv_loop_enable'],
-                    components['slider_conv_loop_width'], components['slider_conv_loop_length'],
-                    components['slider_conv_loop_hole'], components['slider_conv_loop_angle']
-                ],
-                outputs=[conv_preview]
-            )
+    # One handler for all four sliders. Dragging fires change continuously;
+    # always_last drops the queued intermediate values (across every slider)
+    # so only the latest settings are rendered
+    gr.on(
+            triggers=[param.change for param in loop_params],
+            fn=update_preview_with_loop,
+            inputs=[
+                conv_preview_cache, conv_loop_pos, components['checkbox_conv_loop_enable'],
+                components['slider_conv_loop_width'], components['slider_conv_loop_length'],
+                components['slider_conv_loop_hole'], components['slider_conv_loop_angle']
+            ],
+            outputs=[conv_preview],
+            show_progress="hidden",
+            trigger_mode="always_last"
+    )
     generate_event = components['btn_conv_generate_btn'].click(
             fn=process_batch_generation,
             inputs=[
@@ -1530,11 +1681,7 @@ def create_calibration_tab_content(lang: str) -> dict:
             components['md_cal_params'] = gr.Markdown(I18n.get('cal_params', lang))
                 
             components['radio_cal_color_mode'] = gr.Radio(
-                choices=[
-                    (I18n.get('conv_color_mode_cmyw', lang), I18n.get('conv_color_mode_cmyw', 'en')),
-                    (I18n.get('conv_color_mode_rybw', lang), I18n.get('conv_color_mode_rybw', 'en')),
-                    ("6-Color (Smart 1296)", "6-Color (Smart 1296)")
-                ],
+                choices=list(_CHOICE_TABLES['color_mode'][lang]),
                 value=I18n.get('conv_color_mode_rybw', 'en'),
                 label=I18n.get('cal_color_mode', lang)
             )
@@ -1606,95 +1753,97 @@ def create_calibration_tab_content(lang: str) -> dict:
     return components
 
 
-def create_extractor_tab_content(lang: str) -> dict:
-    """Build color extractor tab UI and events. Returns component dict."""
+def create_extractor_tab_content(lang: str, tab=None) -> dict:
+    """Build color extractor tab UI and events. Returns component dict.
+
+    When the enclosing TabItem is passed as tab, the reference image is
+    loaded on first select instead of while the app is built (a cold
+    reference cache means generating a full calibration board).
+    """
+    texts = _lang_texts(lang)
     components = {}
     ext_state_img = gr.State(None)
     ext_state_pts = gr.State([])
     ext_curr_coord = gr.State(None)
     default_mode = I18n.get('conv_color_mode_rybw', 'en')
-    ref_img = get_extractor_reference_image(default_mode)
+    ref_img = get_extractor_reference_image(default_mode) if tab is None else None
 
     with gr.Row():
         with gr.Column(scale=1):
             components['md_ext_upload_section'] = gr.Markdown(
-                I18n.get('ext_upload_section', lang)
+                texts['ext_upload_section']
             )
                 
             components['radio_ext_color_mode'] = gr.Radio(
-                choices=[
-                    (I18n.get('conv_color_mode_cmyw', lang), I18n.get('conv_color_mode_cmyw', 'en')),
-                    (I18n.get('conv_color_mode_rybw', lang), I18n.get('conv_color_mode_rybw', 'en')),
-                    ("6-Color (Smart 1296)", "6-Color (Smart 1296)")
-                ],
+                choices=list(_CHOICE_TABLES['color_mode'][lang]),
                 value=I18n.get('conv_color_mode_rybw', 'en'),
-                label=I18n.get('ext_color_mode', lang)
+                label=texts['ext_color_mode']
             )
                 
             ext_img_in = gr.Image(
-                label=I18n.get('ext_photo', lang),
+                label=texts['ext_photo'],
                 type="numpy",
                 interactive=True
             )
                 
             with gr.Row():
                 components['btn_ext_rotate_btn'] = gr.Button(
-                    I18n.get('ext_rotate_btn', lang)
+                    texts['ext_rotate_btn']
                 )
                 components['btn_ext_reset_btn'] = gr.Button(
-                    I18n.get('ext_reset_btn', lang)
+                    texts['ext_reset_btn']
                 )
                 
             components['md_ext_correction_section'] = gr.Markdown(
-                I18n.get('ext_correction_section', lang)
+                texts['ext_correction_section']
             )
                 
             with gr.Row():
                 components['checkbox_ext_wb'] = gr.Checkbox(
-                    label=I18n.get('ext_wb', lang),
+                    label=texts['ext_wb'],
                     value=True
                 )
                 components['checkbox_ext_vignette'] = gr.Checkbox(
-                    label=I18n.get('ext_vignette', lang),
+                    label=texts['ext_vignette'],
                     value=False
                 )
                 
             components['slider_ext_zoom'] = gr.Slider(
                 0.8, 1.2, 1.0, step=0.005,
-                label=I18n.get('ext_zoom', lang)
+                label=texts['ext_zoom']
             )
                 
             components['slider_ext_distortion'] = gr.Slider(
                 -0.2, 0.2, 0.0, step=0.01,
-                label=I18n.get('ext_distortion', lang)
+                label=texts['ext_distortion']
             )
                 
             components['slider_ext_offset_x'] = gr.Slider(
                 -30, 30, 0, step=1,
-                label=I18n.get('ext_offset_x', lang)
+                label=texts['ext_offset_x']
             )
                 
             components['slider_ext_offset_y'] = gr.Slider(
                 -30, 30, 0, step=1,
-                label=I18n.get('ext_offset_y', lang)
+                label=texts['ext_offset_y']
             )
                 
             components['btn_ext_extract_btn'] = gr.Button(
-                I18n.get('ext_extract_btn', lang),
+                texts['ext_extract_btn'],
                 variant="primary",
                 elem_classes=["primary-btn"]
             )
                 
             components['textbox_ext_status'] = gr.Textbox(
-                label=I18n.get('ext_status', lang),
+                label=texts['ext_status'],
                 interactive=False
             )
             
         with gr.Column(scale=1):
-            ext_hint = gr.Markdown(I18n.get('ext_hint_white', lang))
+            ext_hint = gr.Markdown(texts['ext_hint_white'])
                 
             ext_work_img = gr.Image(
-                label=I18n.get('ext_marked', lang),
+                label=texts['ext_marked'],
                 show_label=False,
                 interactive=True
             )
@@ -1702,13 +1851,13 @@ def create_extractor_tab_content(lang: str) -> dict:
             with gr.Row():
                 with gr.Column():
                     components['md_ext_sampling'] = gr.Markdown(
-                        I18n.get('ext_sampling', lang)
+                        texts['ext_sampling']
                     )
                     ext_warp_view = gr.Image(show_label=False)
                     
                 with gr.Column():
                     components['md_ext_reference'] = gr.Markdown(
-                        I18n.get('ext_reference', lang)
+                        texts['ext_reference']
                     )
                     ext_ref_view = gr.Image(
                         show_label=False,
@@ -1719,7 +1868,7 @@ def create_extractor_tab_content(lang: str) -> dict:
             with gr.Row():
                 with gr.Column():
                     components['md_ext_result'] = gr.Markdown(
-                        I18n.get('ext_result', lang)
+                        texts['ext_result']
                     )
                     ext_lut_view = gr.Image(
                         show_label=False,
@@ -1728,27 +1877,31 @@ def create_extractor_tab_content(lang: str) -> dict:
                     
                 with gr.Column():
                     components['md_ext_manual_fix'] = gr.Markdown(
-                        I18n.get('ext_manual_fix', lang)
+                        texts['ext_manual_fix']
                     )
-                    ext_probe_html = gr.HTML(I18n.get('ext_click_cell', lang))
+                    ext_probe_html = gr.HTML(texts['ext_click_cell'])
                         
                     ext_picker = gr.ColorPicker(
-                        label=I18n.get('ext_override', lang),
+                        label=texts['ext_override'],
                         value="#FF0000"
                     )
                         
                     components['btn_ext_apply_btn'] = gr.Button(
-                        I18n.get('ext_apply_btn', lang)
+                        texts['ext_apply_btn']
                     )
                         
                     components['file_ext_download_npy'] = gr.File(
-                        label=I18n.get('ext_download_npy', lang)
+                        label=texts['ext_download_npy']
                     )
     
+    # Gradio decodes the upload in a worker thread before the (trivial)
+    # callback runs; allow several sessions to decode at once instead of
+    # queueing behind the default limit of one
     ext_img_in.upload(
             on_extractor_upload,
             [ext_img_in, components['radio_ext_color_mode']],
-            [ext_state_img, ext_work_img, ext_state_pts, ext_curr_coord, ext_hint]
+            [ext_state_img, ext_work_img, ext_state_pts, ext_curr_coord, ext_hint],
+            concurrency_limit=4
     )
     
     components['radio_ext_color_mode'].change(
@@ -1763,6 +1916,15 @@ def create_extractor_tab_content(lang: str) -> dict:
         outputs=[ext_ref_view]
     )
 
+    if tab is not None:
+        ext_ref_loaded = gr.State(False)
+        tab.select(
+            fn=_load_extractor_reference_once,
+            inputs=[components['radio_ext_color_mode'], ext_ref_loaded],
+            outputs=[ext_ref_view, ext_ref_loaded],
+            show_progress="minimal"
+        )
+
     components['btn_ext_rotate_btn'].click(
             on_extractor_rotate,
             [ext_state_img, components['radio_ext_color_mode']],
@@ -1793,11 +1955,27 @@ def create_extractor_tab_content(lang: str) -> dict:
             components['file_ext_download_npy'], components['textbox_ext_status']
     ]
     
-    components['btn_ext_extract_btn'].click(run_extraction, extract_inputs, extract_outputs)
+    # Button and sliders share one concurrency slot: every extraction writes
+    # the same LUT file, so they must not run side by side
+    components['btn_ext_extract_btn'].click(
+            run_extraction, extract_inputs, extract_outputs,
+            concurrency_id="ext_extraction"
+    )
     
-    for s in [components['slider_ext_offset_x'], components['slider_ext_offset_y'],
-                  components['slider_ext_zoom'], components['slider_ext_distortion']]:
-            s.release(run_extraction, extract_inputs, extract_outputs)
+    ext_sliders = [
+            components['slider_ext_offset_x'], components['slider_ext_offset_y'],
+            components['slider_ext_zoom'], components['slider_ext_distortion']
+    ]
+    # One handler for all four sliders; always_last drops releases queued
+    # behind a running extraction so only the newest settings are extracted
+    gr.on(
+            triggers=[s.release for s in ext_sliders],
+            fn=run_extraction,
+            inputs=extract_inputs,
+            outputs=extract_outputs,
+            trigger_mode="always_last",
+            concurrency_id="ext_extraction"
+    )
     
     ext_lut_view.select(probe_lut_cell, [], [ext_probe_html, ext_picker, ext_curr_coord])
     components['btn_ext_apply_btn'].click(
@@ -10,18 +10,35 @@ from config import OUTPUT_DIR
 class Stats:
     """Usage statistics (local counter)"""
     _file = os.path.join(OUTPUT_DIR, "lumina_stats.txt")
+    _version = 0  # Bumped on every increment so readers can skip re-reading
 
     @staticmethod
     def increment(key: str) -> int:
         data = Stats._load()
         data[key] = data.get(key, 0) + 1
         Stats._save(data)
+        Stats._version += 1
         return data[key]
 
     @staticmethod
     def get_all() -> dict:
         return Stats._load()
 
+    @staticmethod
+    def get_counts() -> tuple:
+        """(calibrations, extractions, conversions) as a hashable tuple."""
+        data = Stats._load()
+        return (
+            data.get('calibrations', 0),
+            data.get('extractions', 0),
+            data.get('conversions', 0),
+        )
+
+    @staticmethod
+    def get_version() -> int:
+        """Counter that changes whenever the stats are written."""
+        return Stats._version
+
     @staticmethod
     def _load() -> dict:
         try: